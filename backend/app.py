@@ -3,68 +3,225 @@ FastAPI application for Weight Battle.
 All endpoints return JSON only.
 """
 
-from datetime import date
-from typing import Optional
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from datetime import date, timedelta
+from typing import Annotated, Optional
+from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel, Field
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.decorator import cache
+from fastapi_cache.key_builder import default_key_builder
+from mimetypes import guess_type
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints
+from starlette.datastructures import Headers
+import aiosqlite
+import asyncio
+import itertools
+import logging
+import orjson
 import os
+import sqlite3
 
 import crud
 import stats
+import stats_kernels
 import audit
 import models
 
+logger = logging.getLogger(__name__)
+
+# Response cache: Redis if configured, otherwise in-process memory
+REDIS_URL = os.environ.get("REDIS_URL")
+
+# The bundled frontend is same-origin. Local pages (any port) may call the API
+# cross-origin, other origins must be listed in CORS_ORIGINS (comma-separated)
+CORS_ORIGINS = [o.strip() for o in os.environ.get("CORS_ORIGINS", "").split(",") if o.strip()]
+CORS_LOCAL_ORIGIN_REGEX = r"http://(localhost|127\.0\.0\.1)(:\d+)?"
+
+# Read-only connections for GET routes; each runs queries on its own thread
+READ_POOL_SIZE = min(4, os.cpu_count() or 1)
+
+# Cache namespaces, so a write only drops the responses it affects
+CACHE_NS_STATS = "stats"
+CACHE_NS_CONFIG = "config"
+
+# Cache TTLs in seconds (writes invalidate explicitly, TTLs are a safety net)
+CACHE_TTL_SHORT = 10  # Current week, changes with every weigh-in
+CACHE_TTL_NORMAL = 30  # Leaderboard, overview, pot, progress
+CACHE_TTL_LONG = 60  # Prognosis
+CACHE_TTL_CONFIG = 300  # Config, changes a handful of times per battle
+
+# Weigh-ins for the same week within this many seconds share one recalculation
+RECALC_DEBOUNCE = 2.0
+_pending_recalcs: set[date] = set()
+
+# Offset from a week's Monday to its Sunday
+_SIX_DAYS = timedelta(days=6)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson instead of the stdlib encoder."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def cache_key_builder(func, namespace: str = "", *, request=None, response=None, args=(), kwargs=None):
+    """Build cache keys from the endpoint's parameters, ignoring the DB connection."""
+    params = {k: v for k, v in (kwargs or {}).items() if k != "db"}
+    return default_key_builder(
+        func, namespace, request=request, response=response, args=args, kwargs=params
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the shared database connection for the lifetime of the app."""
+    app.state.db = await models.get_connection()
+    await models.init_db(app.state.db)
+    app.state.read_conns = [
+        await models.get_connection(read_only=True) for _ in range(READ_POOL_SIZE)
+    ]
+    app.state.read_pool = itertools.cycle(app.state.read_conns)
+    stats_kernels.warmup()
+
+    if REDIS_URL:
+        from fastapi_cache.backends.redis import RedisBackend
+        from redis import asyncio as aioredis
+        backend = RedisBackend(aioredis.from_url(REDIS_URL))
+    else:
+        backend = InMemoryBackend()
+    FastAPICache.init(backend, prefix="wb", key_builder=cache_key_builder)
+
+    try:
+        yield
+    finally:
+        for conn in app.state.read_conns:
+            await conn.close()
+        await models.close_connection(app.state.db)
+
+
 app = FastAPI(
     title="Weight Battle API",
     description="API for the family weight battle competition",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware for frontend
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=CORS_ORIGINS,
+    allow_origin_regex=CORS_LOCAL_ORIGIN_REGEX,
+    allow_methods=["GET", "POST", "PUT"],
+    allow_headers=["Content-Type"],
+    max_age=86400,  # Browsers may reuse a preflight for a day
 )
 
 
+def get_db_dep(request: Request) -> aiosqlite.Connection:
+    """Dependency that hands routes the shared database connection."""
+    return request.app.state.db
+
+
+def get_read_db_dep(request: Request) -> aiosqlite.Connection:
+    """
+    Dependency for routes that only read: the next read-only connection.
+    These never see uncommitted writes and don't queue behind them.
+    """
+    return next(request.app.state.read_pool)
+
+
+async def invalidate_cache(*namespaces: str) -> None:
+    """
+    Drop cached responses in the given namespaces after a write.
+    The write is already committed, so a cache backend error (e.g. Redis down)
+    is logged instead of failing the request; the TTLs bound the staleness.
+    """
+    for namespace in namespaces:
+        try:
+            await FastAPICache.clear(namespace=namespace)
+        except Exception:
+            logger.warning("Error clearing cache namespace %r", namespace, exc_info=True)
+
+
+@asynccontextmanager
+async def config_transaction(db: aiosqlite.Connection):
+    """
+    Write transaction for routes that change config.
+    Cached /config responses are dropped even if it rolls back.
+    """
+    try:
+        async with models.get_db(db):
+            yield
+    except BaseException:
+        await invalidate_cache(CACHE_NS_CONFIG)
+        raise
+
+
+async def recalculate_week(db: aiosqlite.Connection, week_start: date) -> None:
+    """
+    Recalculate a week's result after a weigh-in, outside the request.
+    Runs as a background task; calls for a week that is already waiting are
+    dropped, since the pending run will see their weigh-ins too.
+    """
+    if week_start in _pending_recalcs:
+        return
+    _pending_recalcs.add(week_start)
+    try:
+        await asyncio.sleep(RECALC_DEBOUNCE)
+    finally:
+        _pending_recalcs.discard(week_start)
+
+    await crud.calculate_weekly_result(db, week_start)
+    await invalidate_cache(CACHE_NS_STATS)
+
+
 # ============================================================================
 # Request/Response Models
 # ============================================================================
 
-class UserCreate(BaseModel):
-    name: str = Field(..., min_length=1, max_length=50)
+Name = Annotated[str, StringConstraints(min_length=1, max_length=50, strip_whitespace=True)]
+
+
+class RequestModel(BaseModel):
+    """Base for request bodies: unknown fields are rejected."""
+    model_config = ConfigDict(extra="forbid")
+
+
+class UserCreate(RequestModel):
+    name: Name
     start_weight: float = Field(..., gt=30, lt=300)
 
 
-class UserUpdate(BaseModel):
-    name: Optional[str] = Field(None, min_length=1, max_length=50)
+class UserUpdate(RequestModel):
+    name: Optional[Name] = None
     start_weight: Optional[float] = Field(None, gt=30, lt=300)
 
 
-class WeighInCreate(BaseModel):
+class WeighInCreate(RequestModel):
     user_id: int
     weight: float = Field(..., gt=30, lt=300)
     week_start: Optional[str] = None  # ISO format date, defaults to current week
 
 
-class ParticipantSetup(BaseModel):
-    name: str = Field(..., min_length=1, max_length=50)
+class ParticipantSetup(RequestModel):
+    name: Name
     start_weight: float = Field(..., gt=30, lt=300)
 
 
-class SetupCreate(BaseModel):
+class SetupCreate(RequestModel):
     participants: list[ParticipantSetup] = Field(..., min_length=1)
     pot_contribution: int = Field(..., ge=1, le=100)
     total_amount: int = Field(..., ge=10, le=1000)
     battle_end_date: str  # ISO format date
 
 
-class ConfigUpdate(BaseModel):
+class ConfigUpdate(RequestModel):
     pot_contribution: Optional[int] = Field(None, ge=1, le=100)
     battle_end_date: Optional[str] = None
 
@@ -74,17 +231,20 @@ class ConfigUpdate(BaseModel):
 # ============================================================================
 
 @app.get("/setup/status")
-def get_setup_status():
+async def get_setup_status(db: aiosqlite.Connection = Depends(get_read_db_dep)):
     """Check if the initial setup has been completed."""
+    # The flag comes from the config cache, so this is a single query
+    has_config = await models.get_config(db, "setup_complete") is not None
+    has_users = await crud.has_users(db)
     return {
-        "setup_complete": models.is_setup_complete(),
-        "has_users": len(crud.get_all_users()) > 0,
-        "has_config": models.get_config("setup_complete") is not None,
+        "setup_complete": has_config and has_users,
+        "has_users": has_users,
+        "has_config": has_config,
     }
 
 
 @app.post("/setup")
-def complete_setup(setup: SetupCreate):
+async def complete_setup(setup: SetupCreate, db: aiosqlite.Connection = Depends(get_db_dep)):
     """Complete the initial setup with participants and configuration."""
     # Validate end date
     try:
@@ -92,35 +252,39 @@ def complete_setup(setup: SetupCreate):
     except ValueError:
         raise HTTPException(status_code=400, detail="Ungultiges Datum. Format: YYYY-MM-DD")
 
-    # Check if already set up
-    if models.is_setup_complete():
-        raise HTTPException(status_code=400, detail="Setup wurde bereits abgeschlossen")
-
-    # Save config
-    models.set_config("pot_contribution", str(setup.pot_contribution))
-    models.set_config("total_amount", str(setup.total_amount))
-    models.set_config("battle_end_date", setup.battle_end_date)
-
-    # Create participants
-    created_users = []
-    for participant in setup.participants:
-        try:
-            user = crud.create_user(
-                name=participant.name,
-                start_weight=participant.start_weight,
-                created_by="setup"
-            )
-            created_users.append(user)
-        except Exception as e:
-            if "UNIQUE constraint failed" in str(e):
+    # One transaction: a failed participant leaves nothing behind
+    async with config_transaction(db):
+        # Check if already set up
+        if await models.is_setup_complete(db):
+            raise HTTPException(status_code=400, detail="Setup wurde bereits abgeschlossen")
+
+        # Save config
+        await models.set_config(db, "pot_contribution", str(setup.pot_contribution))
+        await models.set_config(db, "total_amount", str(setup.total_amount))
+        await models.set_config(db, "battle_end_date", setup.battle_end_date)
+
+        # Create participants
+        created_users = []
+        for participant in setup.participants:
+            try:
+                user = await crud.create_user(
+                    db,
+                    name=participant.name,
+                    start_weight=participant.start_weight,
+                    created_by="setup"
+                )
+                created_users.append(user)
+            except sqlite3.IntegrityError:
+                # Duplicate name; the whole setup transaction is rolled back
                 raise HTTPException(
                     status_code=400,
                     detail=f"Teilnehmer '{participant.name}' existiert bereits"
                 )
-            raise HTTPException(status_code=500, detail=str(e))
 
-    # Mark setup as complete
-    models.set_config("setup_complete", "true")
+        # Mark setup as complete
+        await models.set_config(db, "setup_complete", "true")
+
+    await invalidate_cache(CACHE_NS_STATS, CACHE_NS_CONFIG)
 
     return {
         "success": True,
@@ -134,40 +298,41 @@ def complete_setup(setup: SetupCreate):
 
 
 @app.get("/config")
-def get_config():
+@cache(expire=CACHE_TTL_CONFIG, namespace=CACHE_NS_CONFIG)
+async def get_config(db: aiosqlite.Connection = Depends(get_read_db_dep)):
     """Get the current configuration."""
     return {
-        "pot_contribution": models.get_pot_contribution(),
-        "battle_end_date": models.get_battle_end_date(),
-        "setup_complete": models.is_setup_complete(),
+        "pot_contribution": await models.get_pot_contribution(db),
+        "battle_end_date": await models.get_battle_end_date(db),
+        "setup_complete": await models.is_setup_complete(db),
     }
 
 
 @app.put("/config")
-def update_config(config: ConfigUpdate):
+async def update_config(config: ConfigUpdate, db: aiosqlite.Connection = Depends(get_db_dep)):
     """Update the configuration."""
-    if config.pot_contribution is not None:
-        models.set_config("pot_contribution", str(config.pot_contribution))
-
     if config.battle_end_date is not None:
         try:
             date.fromisoformat(config.battle_end_date)
         except ValueError:
             raise HTTPException(status_code=400, detail="Ungultiges Datum. Format: YYYY-MM-DD")
-        models.set_config("battle_end_date", config.battle_end_date)
 
-    return get_config()
+    async with config_transaction(db):
+        if config.pot_contribution is not None:
+            await models.set_config(db, "pot_contribution", str(config.pot_contribution))
 
+        if config.battle_end_date is not None:
+            await models.set_config(db, "battle_end_date", config.battle_end_date)
 
-@app.post("/setup/demo")
-def load_demo_data():
-    """Load demo data for testing purposes."""
-    from datetime import timedelta
+    # Battle end date feeds the prognosis and overview
+    await invalidate_cache(CACHE_NS_STATS, CACHE_NS_CONFIG)
 
-    # Check if already set up
-    if models.is_setup_complete():
-        raise HTTPException(status_code=400, detail="Setup wurde bereits abgeschlossen")
+    return await get_config(db)
 
+
+@app.post("/setup/demo")
+async def load_demo_data(db: aiosqlite.Connection = Depends(get_db_dep)):
+    """Load demo data for testing purposes."""
     # Demo participants with realistic starting weights
     participants = [
         ("Papa", 98.5),
@@ -184,38 +349,47 @@ def load_demo_data():
         "Lisa": [-0.3, -0.4, -0.2, -0.3, -0.5, -0.3, -0.4, -0.3],
     }
 
-    # Set config
-    models.set_config("pot_contribution", "5")
-    models.set_config("total_amount", "100")
-    models.set_config("battle_end_date", "2026-04-05")
+    # One transaction: the setup check can't race a concurrent setup
+    async with config_transaction(db):
+        # Check if already set up
+        if await models.is_setup_complete(db):
+            raise HTTPException(status_code=400, detail="Setup wurde bereits abgeschlossen")
+
+        # Set config
+        await models.set_config(db, "pot_contribution", "5")
+        await models.set_config(db, "total_amount", "100")
+        await models.set_config(db, "battle_end_date", "2026-04-05")
+
+        # Create users
+        users = {}
+        for name, start_weight in participants:
+            try:
+                user = await crud.create_user(db, name, start_weight, created_by="demo")
+            except sqlite3.IntegrityError:
+                # Users from a manual setup exist; the whole transaction is rolled back
+                raise HTTPException(status_code=400, detail=f"Teilnehmer '{name}' existiert bereits")
+            users[name] = user
 
-    # Create users
-    users = {}
-    for name, start_weight in participants:
-        user = crud.create_user(name, start_weight, created_by="demo")
-        users[name] = user
+        # Generate weigh-ins for the past 8 weeks
+        today = date.today()
+        start_date = crud.get_week_start(today - timedelta(weeks=8))
 
-    # Generate weigh-ins for the past 8 weeks
-    today = date.today()
-    start_date = crud.get_week_start(today - timedelta(weeks=8))
+        weigh_ins = []
+        for week_num in range(8):
+            week_start = start_date + timedelta(weeks=week_num)
 
-    for week_num in range(8):
-        week_start = start_date + timedelta(weeks=week_num)
+            for name, (_, start_weight) in zip(users.keys(), participants):
+                user = users[name]
+                total_change = sum(patterns[name][:week_num + 1])
+                weight = round(start_weight + total_change, 1)
+                weigh_ins.append((user["id"], week_start, weight, name))
 
-        for name, (_, start_weight) in zip(users.keys(), participants):
-            user = users[name]
-            total_change = sum(patterns[name][:week_num + 1])
-            weight = round(start_weight + total_change, 1)
+        await crud.create_weigh_ins(db, weigh_ins)
 
-            crud.create_weigh_in(
-                user_id=user["id"],
-                weight=weight,
-                week_start=week_start,
-                created_by=name
-            )
+        # Mark setup as complete
+        await models.set_config(db, "setup_complete", "true")
 
-    # Mark setup as complete
-    models.set_config("setup_complete", "true")
+    await invalidate_cache(CACHE_NS_STATS, CACHE_NS_CONFIG)
 
     return {
         "success": True,
@@ -230,41 +404,47 @@ def load_demo_data():
 # ============================================================================
 
 @app.get("/users")
-def get_users():
+async def get_users(db: aiosqlite.Connection = Depends(get_read_db_dep)):
     """Get all users/participants."""
-    return crud.get_all_users()
+    return await crud.get_all_users(db)
 
 
 @app.post("/users")
-def create_user(user: UserCreate):
+async def create_user(user: UserCreate, db: aiosqlite.Connection = Depends(get_db_dep)):
     """Create a new user/participant."""
     try:
-        return crud.create_user(name=user.name, start_weight=user.start_weight)
-    except Exception as e:
-        if "UNIQUE constraint failed" in str(e):
-            raise HTTPException(status_code=400, detail="User with this name already exists")
-        raise HTTPException(status_code=500, detail=str(e))
+        created = await crud.create_user(db, name=user.name, start_weight=user.start_weight)
+        await invalidate_cache(CACHE_NS_STATS)
+        return created
+    except sqlite3.IntegrityError:
+        raise HTTPException(status_code=400, detail="User with this name already exists")
 
 
 @app.get("/users/{user_id}")
-def get_user(user_id: int):
+async def get_user(user_id: int, db: aiosqlite.Connection = Depends(get_read_db_dep)):
     """Get a specific user by ID."""
-    user = crud.get_user(user_id)
+    user = await crud.get_user(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 
 @app.put("/users/{user_id}")
-def update_user(user_id: int, user: UserUpdate):
+async def update_user(
+    user_id: int,
+    user: UserUpdate,
+    db: aiosqlite.Connection = Depends(get_db_dep)
+):
     """Update a user's information."""
-    updated = crud.update_user(
+    updated = await crud.update_user(
+        db,
         user_id=user_id,
         name=user.name,
         start_weight=user.start_weight
     )
     if not updated:
         raise HTTPException(status_code=404, detail="User not found")
+    await invalidate_cache(CACHE_NS_STATS)
     return updated
 
 
@@ -273,38 +453,34 @@ def update_user(user_id: int, user: UserUpdate):
 # ============================================================================
 
 @app.get("/weeks/current")
-def get_current_week():
+@cache(expire=CACHE_TTL_SHORT, namespace=CACHE_NS_STATS)
+async def get_current_week(db: aiosqlite.Connection = Depends(get_read_db_dep)):
     """Get information about the current week."""
     week_start = crud.get_current_week_start()
-    weigh_ins = crud.get_week_weigh_ins(week_start)
-    result = crud.get_weekly_result(week_start)
-    users = crud.get_all_users()
-
-    # Calculate who hasn't weighed in yet
-    weighed_in_ids = {wi["user_id"] for wi in weigh_ins}
-    missing = [u for u in users if u["id"] not in weighed_in_ids]
+    weigh_ins, missing = await crud.get_week_participation(db, week_start)
+    result = await crud.get_weekly_result(db, week_start)
 
     return {
         "week_start": week_start.isoformat(),
-        "week_end": (week_start + __import__("datetime").timedelta(days=6)).isoformat(),
+        "week_end": (week_start + _SIX_DAYS).isoformat(),
         "weigh_ins": weigh_ins,
         "result": result,
         "missing_participants": missing,
-        "all_weighed_in": len(missing) == 0 and len(users) > 0,
+        "all_weighed_in": len(missing) == 0 and len(weigh_ins) > 0,
     }
 
 
 @app.get("/weeks/{week_start}")
-def get_week(week_start: str):
+async def get_week(week_start: str, db: aiosqlite.Connection = Depends(get_read_db_dep)):
     """Get information about a specific week."""
     try:
         week_date = date.fromisoformat(week_start)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
 
-    weigh_ins = crud.get_week_weigh_ins(week_date)
-    result = crud.get_weekly_result(week_date)
-    comparison = stats.get_weekly_comparison(week_date)
+    weigh_ins = await crud.get_week_weigh_ins(db, week_date)
+    result = await crud.get_weekly_result(db, week_date)
+    comparison = await stats.get_weekly_comparison(db, week_date)
 
     return {
         "week_start": week_start,
@@ -319,13 +495,12 @@ def get_week(week_start: str):
 # ============================================================================
 
 @app.post("/weigh-ins")
-def create_weigh_in(weigh_in: WeighInCreate):
+async def create_weigh_in(
+    weigh_in: WeighInCreate,
+    background_tasks: BackgroundTasks,
+    db: aiosqlite.Connection = Depends(get_db_dep)
+):
     """Record a weigh-in for a user."""
-    # Validate user exists
-    user = crud.get_user(weigh_in.user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
     # Parse week_start if provided
     week_start = None
     if weigh_in.week_start:
@@ -333,17 +508,32 @@ def create_weigh_in(weigh_in: WeighInCreate):
             week_start = date.fromisoformat(weigh_in.week_start)
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    actual_week = week_start or crud.get_current_week_start()
 
-    result = crud.create_weigh_in(
-        user_id=weigh_in.user_id,
-        weight=weigh_in.weight,
-        week_start=week_start,
-        created_by=user["name"]
-    )
+    # Reads on the shared connection go inside the transaction too, so they
+    # never see another request's uncommitted writes
+    async with models.get_db(db):
+        # Validate user exists
+        user = await crud.get_user(db, weigh_in.user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        result = await crud.create_weigh_in(
+            db,
+            user_id=weigh_in.user_id,
+            weight=weigh_in.weight,
+            week_start=week_start,
+            created_by=user["name"]
+        )
+
+        # Previous weight for the response's percentage change
+        prev_weight = await crud.get_previous_weight(db, weigh_in.user_id, actual_week)
+
+    await invalidate_cache(CACHE_NS_STATS)
+
+    # The weekly result isn't part of the response, update it afterwards
+    background_tasks.add_task(recalculate_week, db, actual_week)
 
-    # Calculate percentage change for response
-    actual_week = week_start or crud.get_current_week_start()
-    prev_weight = crud.get_previous_weight(weigh_in.user_id, actual_week)
     pct_change = crud.calculate_percentage_change(prev_weight, weigh_in.weight) if prev_weight else 0
 
     return {
@@ -354,24 +544,39 @@ def create_weigh_in(weigh_in: WeighInCreate):
 
 
 @app.get("/weigh-ins/user/{user_id}")
-def get_user_weigh_ins(user_id: int):
-    """Get all weigh-ins for a specific user."""
-    user = crud.get_user(user_id)
+async def get_user_weigh_ins(
+    user_id: int,
+    since: Optional[str] = None,
+    db: aiosqlite.Connection = Depends(get_read_db_dep)
+):
+    """Get all weigh-ins for a specific user, optionally only from `since` (YYYY-MM-DD) on."""
+    user = await crud.get_user(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    return crud.get_user_weigh_ins(user_id)
+    since_date = None
+    if since:
+        try:
+            since_date = date.fromisoformat(since)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+
+    return await crud.get_user_weigh_ins(db, user_id, since=since_date)
 
 
 @app.get("/weigh-ins/preview")
-def preview_weigh_in(user_id: int, weight: float):
+async def preview_weigh_in(
+    user_id: int,
+    weight: float,
+    db: aiosqlite.Connection = Depends(get_read_db_dep)
+):
     """Preview what the percentage change would be without saving."""
-    user = crud.get_user(user_id)
+    user = await crud.get_user(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     week_start = crud.get_current_week_start()
-    prev_weight = crud.get_previous_weight(user_id, week_start)
+    prev_weight = await crud.get_previous_weight(db, user_id, week_start)
 
     if not prev_weight:
         prev_weight = user["start_weight"]
@@ -391,42 +596,47 @@ def preview_weigh_in(user_id: int, weight: float):
 # ============================================================================
 
 @app.get("/stats/overview")
-def get_overview():
+@cache(expire=CACHE_TTL_NORMAL, namespace=CACHE_NS_STATS)
+async def get_overview(db: aiosqlite.Connection = Depends(get_read_db_dep)):
     """Get a complete overview of the battle state."""
-    return stats.get_overview()
+    return await stats.get_overview(db)
 
 
 @app.get("/stats/user/{user_id}")
-def get_user_stats(user_id: int):
+async def get_user_stats(user_id: int, db: aiosqlite.Connection = Depends(get_read_db_dep)):
     """Get detailed statistics for a specific user."""
-    user_stats = stats.get_user_stats(user_id)
+    user_stats = await stats.get_user_stats(db, user_id)
     if not user_stats:
         raise HTTPException(status_code=404, detail="User not found")
     return user_stats
 
 
 @app.get("/stats/pot")
-def get_pot():
+@cache(expire=CACHE_TTL_NORMAL, namespace=CACHE_NS_STATS)
+async def get_pot(db: aiosqlite.Connection = Depends(get_read_db_dep)):
     """Get POT information (total, contributions, who pays at the end)."""
-    return stats.get_pot_info()
+    return await stats.get_pot_info(db)
 
 
 @app.get("/stats/prognosis")
-def get_prognosis():
+@cache(expire=CACHE_TTL_LONG, namespace=CACHE_NS_STATS)
+async def get_prognosis(db: aiosqlite.Connection = Depends(get_read_db_dep)):
     """Get weight projections until battle end."""
-    return stats.get_prognosis()
+    return await stats.get_prognosis(db)
 
 
 @app.get("/stats/leaderboard")
-def get_leaderboard():
+@cache(expire=CACHE_TTL_NORMAL, namespace=CACHE_NS_STATS)
+async def get_leaderboard(db: aiosqlite.Connection = Depends(get_read_db_dep)):
     """Get the current leaderboard."""
-    return stats.get_leaderboard()
+    return await stats.get_leaderboard(db)
 
 
 @app.get("/stats/progress")
-def get_progress():
+@cache(expire=CACHE_TTL_NORMAL, namespace=CACHE_NS_STATS)
+async def get_progress(db: aiosqlite.Connection = Depends(get_read_db_dep)):
     """Get relative progress data for charting."""
-    return stats.get_relative_progress()
+    return await stats.get_relative_progress(db)
 
 
 # ============================================================================
@@ -434,22 +644,87 @@ def get_progress():
 # ============================================================================
 
 @app.get("/audit")
-def get_audit_log(
+async def get_audit_log(
     entity: Optional[str] = None,
     entity_id: Optional[int] = None,
-    limit: int = 100
+    limit: int = Query(100, ge=1, le=500),
+    before_id: Optional[int] = None,
+    db: aiosqlite.Connection = Depends(get_read_db_dep)
 ):
-    """Get audit log entries."""
-    return audit.get_audit_log(entity=entity, entity_id=entity_id, limit=limit)
+    """
+    Get audit log entries, newest first.
+    Pass the returned next_cursor as before_id to fetch the next page.
+    """
+    items = await audit.get_audit_log(
+        db, entity=entity, entity_id=entity_id, limit=limit, before_id=before_id
+    )
+    return {
+        "items": items,
+        "next_cursor": items[-1]["id"] if len(items) == limit else None,
+    }
 
 
 # ============================================================================
 # Serve Frontend (optional - for simple deployment)
 # ============================================================================
 
+def accepted_encodings(header: str) -> set[str]:
+    """
+    Content codings an Accept-Encoding header allows, lowercased.
+    Codings with q=0 are refused and left out (RFC 9110, section 12.5.3).
+    """
+    accepted = set()
+    for part in header.split(","):
+        name, *params = (p.strip() for p in part.split(";"))
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name and q > 0:
+            accepted.add(name.lower())
+    return accepted
+
+
+class FrontendFiles(StaticFiles):
+    """
+    Static files that revalidate via ETag and prefer precompressed variants.
+    Asset names aren't hashed, so browsers must check for changes on every load;
+    unchanged files then cost a 304 instead of a full download.
+    """
+
+    # Checked in order of preference, next to the original file
+    ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        media_type = guess_type(str(full_path))[0] or "text/plain"
+        if media_type.startswith("text/"):
+            media_type += "; charset=utf-8"
+
+        encoding = None
+        for name, suffix in self.ENCODINGS:
+            if name in accepted and os.path.isfile(f"{full_path}{suffix}"):
+                encoding = name
+                full_path = f"{full_path}{suffix}"
+                stat_result = os.stat(full_path)
+                break
+
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if encoding and response.status_code != 304:
+            response.headers["content-type"] = media_type
+            response.headers["content-encoding"] = encoding
+        response.headers["cache-control"] = "no-cache"
+        response.headers["vary"] = "Accept-Encoding"
+        return response
+
+
 frontend_path = os.path.join(os.path.dirname(__file__), "..", "frontend")
 if os.path.exists(frontend_path):
-    app.mount("/", StaticFiles(directory=frontend_path, html=True), name="frontend")
+    app.mount("/", FrontendFiles(directory=frontend_path, html=True), name="frontend")
 
 
 if __name__ == "__main__":
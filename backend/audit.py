@@ -3,103 +3,170 @@ Audit logging for transparent change tracking.
 All modifications are logged with who, when, and what changed.
 """
 
-import json
+import itertools
+import orjson
 from datetime import datetime
+from functools import lru_cache
 from typing import Any, Optional
-from models import get_db
 
+import aiosqlite
 
-def log_change(
+
+def _build_audit_log_query(has_entity: bool, has_entity_id: bool, has_before_id: bool) -> str:
+    """Build the audit log SELECT for one combination of filters."""
+    conditions = []
+    if has_entity:
+        conditions.append("entity = ?")
+    if has_entity_id:
+        conditions.append("entity_id = ?")
+    if has_before_id:
+        conditions.append("id < ?")
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"SELECT * FROM audit_log{where} ORDER BY id DESC LIMIT ?"
+
+
+# One fixed statement per filter combination (entity?, entity_id?, before_id?),
+# so SQLite's statement cache can reuse the compiled plan
+_AUDIT_LOG_QUERIES = {
+    shape: _build_audit_log_query(*shape)
+    for shape in itertools.product((False, True), repeat=3)
+}
+
+
+@lru_cache(maxsize=4096)
+def _dumps_items(items: tuple) -> str:
+    """Serialize a flat dict given as (key, type, value) triples."""
+    return orjson.dumps({key: value for key, _, value in items}).decode()
+
+
+def _dumps(value: Any) -> Optional[str]:
+    """
+    Serialize a value for the TEXT columns of the audit log.
+    Flat dicts are memoized, the same small values recur on every write.
+    """
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        # The type keeps 80 and 80.0 apart, they hash equal but serialize differently
+        items = tuple((key, type(item), item) for key, item in value.items())
+        try:
+            return _dumps_items(items)
+        except TypeError:
+            pass  # Nested or otherwise unhashable values
+    return orjson.dumps(value).decode()
+
+
+async def log_change(
+    db: aiosqlite.Connection,
     entity: str,
     entity_id: int,
     old_value: Any,
     new_value: Any,
-    changed_by: str,
-    cursor=None
+    changed_by: str
 ) -> int:
     """
     Log a change to the audit log.
+    Runs inside the caller's transaction so the change and its log entry commit together.
 
     Args:
+        db: Connection with an open write transaction
         entity: The type of entity changed (e.g., 'user', 'weigh_in')
         entity_id: The ID of the entity
         old_value: The previous value (will be JSON serialized)
         new_value: The new value (will be JSON serialized)
         changed_by: Who made the change
-        cursor: Optional cursor to reuse existing connection
 
     Returns:
         The ID of the audit log entry
     """
-    old_json = json.dumps(old_value) if old_value is not None else None
-    new_json = json.dumps(new_value) if new_value is not None else None
-
-    if cursor:
-        cursor.execute("""
-            INSERT INTO audit_log (entity, entity_id, old_value, new_value, changed_by)
-            VALUES (?, ?, ?, ?, ?)
-        """, (entity, entity_id, old_json, new_json, changed_by))
+    old_json = _dumps(old_value)
+    new_json = _dumps(new_value)
+
+    async with db.execute("""
+        INSERT INTO audit_log (entity, entity_id, old_value, new_value, changed_by)
+        VALUES (?, ?, ?, ?, ?)
+    """, (entity, entity_id, old_json, new_json, changed_by)) as cursor:
         return cursor.lastrowid
-    else:
-        with get_db() as conn:
-            cur = conn.cursor()
-            cur.execute("""
-                INSERT INTO audit_log (entity, entity_id, old_value, new_value, changed_by)
-                VALUES (?, ?, ?, ?, ?)
-            """, (entity, entity_id, old_json, new_json, changed_by))
-            return cur.lastrowid
 
 
-def get_audit_log(
+async def log_changes(
+    db: aiosqlite.Connection,
+    changes: list[tuple[str, int, Any, Any, str]]
+) -> None:
+    """
+    Log many changes with a single statement.
+
+    Args:
+        db: Connection with an open write transaction
+        changes: (entity, entity_id, old_value, new_value, changed_by) tuples
+    """
+    rows = [
+        (
+            entity,
+            entity_id,
+            _dumps(old_value),
+            _dumps(new_value),
+            changed_by,
+        )
+        for entity, entity_id, old_value, new_value, changed_by in changes
+    ]
+    await db.executemany("""
+        INSERT INTO audit_log (entity, entity_id, old_value, new_value, changed_by)
+        VALUES (?, ?, ?, ?, ?)
+    """, rows)
+
+
+async def get_audit_log(
+    db: aiosqlite.Connection,
     entity: Optional[str] = None,
     entity_id: Optional[int] = None,
-    limit: int = 100
+    limit: int = 100,
+    before_id: Optional[int] = None
 ) -> list[dict]:
     """
-    Retrieve audit log entries.
+    Retrieve audit log entries, newest first.
 
     Args:
+        db: Database connection
         entity: Filter by entity type
         entity_id: Filter by entity ID
         limit: Maximum number of entries to return
+        before_id: Only return entries older than this ID (pagination cursor)
 
     Returns:
         List of audit log entries
     """
-    with get_db() as conn:
-        cursor = conn.cursor()
-
-        query = "SELECT * FROM audit_log WHERE 1=1"
-        params = []
-
-        if entity:
-            query += " AND entity = ?"
-            params.append(entity)
-
-        if entity_id is not None:
-            query += " AND entity_id = ?"
-            params.append(entity_id)
-
-        query += " ORDER BY changed_at DESC LIMIT ?"
-        params.append(limit)
-
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-
-        return [
-            {
-                "id": row["id"],
-                "entity": row["entity"],
-                "entity_id": row["entity_id"],
-                "old_value": json.loads(row["old_value"]) if row["old_value"] else None,
-                "new_value": json.loads(row["new_value"]) if row["new_value"] else None,
-                "changed_by": row["changed_by"],
-                "changed_at": row["changed_at"]
-            }
-            for row in rows
-        ]
-
-
-def get_recent_changes(limit: int = 10) -> list[dict]:
+    has_entity = bool(entity)
+    has_entity_id = entity_id is not None
+    has_before_id = before_id is not None
+    query = _AUDIT_LOG_QUERIES[(has_entity, has_entity_id, has_before_id)]
+
+    params = []
+    if has_entity:
+        params.append(entity)
+    if has_entity_id:
+        params.append(entity_id)
+    if has_before_id:
+        params.append(before_id)
+    params.append(limit)
+
+    async with db.execute(query, params) as cursor:
+        rows = await cursor.fetchall()
+
+    return [
+        {
+            "id": row["id"],
+            "entity": row["entity"],
+            "entity_id": row["entity_id"],
+            "old_value": orjson.loads(row["old_value"]) if row["old_value"] else None,
+            "new_value": orjson.loads(row["new_value"]) if row["new_value"] else None,
+            "changed_by": row["changed_by"],
+            "changed_at": row["changed_at"]
+        }
+        for row in rows
+    ]
+
+
+async def get_recent_changes(db: aiosqlite.Connection, limit: int = 10) -> list[dict]:
     """Get the most recent changes across all entities."""
-    return get_audit_log(limit=limit)
+    return await get_audit_log(db, limit=limit)
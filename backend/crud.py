@@ -4,20 +4,32 @@ All database access should go through this module.
 """
 
 from datetime import date, datetime, timedelta
+from functools import lru_cache
 from typing import Optional
+
+import aiosqlite
+import numpy as np
+
 from models import get_db, get_pot_contribution
-from audit import log_change
+from audit import log_change, log_changes
+from stats_kernels import pct_changes
 
 
 # ============================================================================
 # User Operations
 # ============================================================================
 
-def create_user(name: str, start_weight: float, created_by: str = "system") -> dict:
+async def create_user(
+    db: aiosqlite.Connection,
+    name: str,
+    start_weight: float,
+    created_by: str = "system"
+) -> dict:
     """
     Create a new user/participant.
 
     Args:
+        db: Database connection
         name: Display name of the user
         start_weight: Starting weight in kg
         created_by: Who created this user
@@ -25,54 +37,56 @@ def create_user(name: str, start_weight: float, created_by: str = "system") -> d
     Returns:
         The created user record
     """
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
+    async with get_db(db) as conn:
+        async with conn.execute("""
             INSERT INTO users (name, start_weight)
             VALUES (?, ?)
-        """, (name, round(start_weight, 1)))
-        user_id = cursor.lastrowid
+        """, (name, round(start_weight, 1))) as cursor:
+            user_id = cursor.lastrowid
 
-        # Log the creation (pass cursor to avoid nested connection)
-        log_change(
+        # Log the creation in the same transaction
+        await log_change(
+            conn,
             entity="user",
             entity_id=user_id,
             old_value=None,
             new_value={"name": name, "start_weight": start_weight},
-            changed_by=created_by,
-            cursor=cursor
+            changed_by=created_by
         )
 
-    return get_user(user_id)
+    return await get_user(db, user_id)
 
 
-def get_user(user_id: int) -> Optional[dict]:
+async def get_user(db: aiosqlite.Connection, user_id: int) -> Optional[dict]:
     """Get a user by ID."""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-        row = cursor.fetchone()
-        if row:
-            return dict(row)
-        return None
+    async with db.execute("SELECT * FROM users WHERE id = ?", (user_id,)) as cursor:
+        row = await cursor.fetchone()
+    if row:
+        return dict(row)
+    return None
 
 
-def get_all_users() -> list[dict]:
+async def get_all_users(db: aiosqlite.Connection) -> list[dict]:
     """Get all users."""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users ORDER BY name")
-        return [dict(row) for row in cursor.fetchall()]
+    async with db.execute("SELECT * FROM users ORDER BY name") as cursor:
+        return [dict(row) for row in await cursor.fetchall()]
+
 
+async def has_users(db: aiosqlite.Connection) -> bool:
+    """Check whether at least one user exists."""
+    async with db.execute("SELECT 1 FROM users LIMIT 1") as cursor:
+        return await cursor.fetchone() is not None
 
-def update_user(
+
+async def update_user(
+    db: aiosqlite.Connection,
     user_id: int,
     name: Optional[str] = None,
     start_weight: Optional[float] = None,
     changed_by: str = "system"
 ) -> Optional[dict]:
     """Update a user's information."""
-    user = get_user(user_id)
+    user = await get_user(db, user_id)
     if not user:
         return None
 
@@ -80,28 +94,34 @@ def update_user(
     new_name = name if name is not None else user["name"]
     new_weight = round(start_weight, 1) if start_weight is not None else user["start_weight"]
 
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
+    async with get_db(db) as conn:
+        await conn.execute("""
             UPDATE users SET name = ?, start_weight = ? WHERE id = ?
         """, (new_name, new_weight, user_id))
 
-        log_change(
+        await log_change(
+            conn,
             entity="user",
             entity_id=user_id,
             old_value=old_value,
             new_value={"name": new_name, "start_weight": new_weight},
-            changed_by=changed_by,
-            cursor=cursor
+            changed_by=changed_by
         )
 
-    return get_user(user_id)
+    return await get_user(db, user_id)
 
 
 # ============================================================================
 # Weigh-in Operations
 # ============================================================================
 
+@lru_cache(maxsize=512)
+def _week_start_from_ordinal(ordinal: int) -> date:
+    """Get the Monday of the week containing a proleptic Gregorian ordinal."""
+    # Ordinal 1 (0001-01-01) is a Monday
+    return date.fromordinal((ordinal - 1) // 7 * 7 + 1)
+
+
 def get_week_start(d: date = None) -> date:
     """
     Get the Monday of the week for a given date.
@@ -109,17 +129,17 @@ def get_week_start(d: date = None) -> date:
     """
     if d is None:
         d = date.today()
-    # Monday is weekday 0
-    days_since_monday = d.weekday()
-    return d - timedelta(days=days_since_monday)
+    return _week_start_from_ordinal(d.toordinal())
 
 
 def get_current_week_start() -> date:
     """Get the start of the current week."""
-    return get_week_start(date.today())
+    # Keyed on today's ordinal, so the cached value rolls over at midnight
+    return _week_start_from_ordinal(date.today().toordinal())
 
 
-def create_weigh_in(
+async def create_weigh_in(
+    db: aiosqlite.Connection,
     user_id: int,
     weight: float,
     week_start: date = None,
@@ -128,8 +148,11 @@ def create_weigh_in(
     """
     Record a weigh-in for a user.
     If a weigh-in already exists for this week, it will be updated.
+    The weekly result is not recalculated; call calculate_weekly_result()
+    afterwards.
 
     Args:
+        db: Database connection
         user_id: The user's ID
         weight: Weight in kg
         week_start: The Monday of the week (defaults to current week)
@@ -143,113 +166,278 @@ def create_weigh_in(
 
     weight = round(weight, 1)
 
-    # Check if weigh-in already exists
-    existing = get_weigh_in(user_id, week_start)
-
-    with get_db() as conn:
-        cursor = conn.cursor()
+    async with get_db(db) as conn:
+        # The previous weight is only needed for the audit log
+        async with conn.execute("""
+            SELECT weight FROM weigh_ins
+            WHERE user_id = ? AND week_start = ?
+        """, (user_id, week_start.isoformat())) as cursor:
+            existing = await cursor.fetchone()
+
+        # RETURNING hands back a whole-number REAL (79.0) as an int, hence the CAST
+        async with conn.execute("""
+            INSERT INTO weigh_ins (user_id, week_start, weight)
+            VALUES (?, ?, ?)
+            ON CONFLICT (user_id, week_start)
+            DO UPDATE SET weight = excluded.weight, created_at = CURRENT_TIMESTAMP
+            RETURNING id, user_id, week_start, CAST(weight AS REAL) AS weight, created_at
+        """, (user_id, week_start.isoformat(), weight)) as cursor:
+            weigh_in = dict(await cursor.fetchone())
 
         if existing:
-            # Update existing weigh-in
-            old_value = {"weight": existing["weight"]}
-            cursor.execute("""
-                UPDATE weigh_ins
-                SET weight = ?, created_at = CURRENT_TIMESTAMP
-                WHERE user_id = ? AND week_start = ?
-            """, (weight, user_id, week_start.isoformat()))
-
-            log_change(
+            await log_change(
+                conn,
                 entity="weigh_in",
-                entity_id=existing["id"],
-                old_value=old_value,
+                entity_id=weigh_in["id"],
+                old_value={"weight": existing["weight"]},
                 new_value={"weight": weight},
-                changed_by=created_by,
-                cursor=cursor
+                changed_by=created_by
             )
         else:
-            # Create new weigh-in
-            cursor.execute("""
-                INSERT INTO weigh_ins (user_id, week_start, weight)
-                VALUES (?, ?, ?)
-            """, (user_id, week_start.isoformat(), weight))
-
-            weigh_in_id = cursor.lastrowid
-            log_change(
+            await log_change(
+                conn,
                 entity="weigh_in",
-                entity_id=weigh_in_id,
+                entity_id=weigh_in["id"],
                 old_value=None,
                 new_value={"user_id": user_id, "week_start": week_start.isoformat(), "weight": weight},
-                changed_by=created_by,
-                cursor=cursor
+                changed_by=created_by
             )
 
-    # Recalculate weekly results after weigh-in
-    calculate_weekly_result(week_start)
+    return weigh_in
 
-    return get_weigh_in(user_id, week_start)
 
+async def create_weigh_ins(
+    db: aiosqlite.Connection,
+    weigh_ins: list[tuple[int, date, float, str]]
+) -> None:
+    """
+    Record many new weigh-ins at once (e.g. demo data).
+    Unlike create_weigh_in(), the weigh-ins must not exist yet. Rows and audit
+    entries are inserted in bulk, then each affected week is evaluated once.
+
+    Args:
+        db: Database connection
+        weigh_ins: (user_id, week_start, weight, created_by) tuples
+    """
+    if not weigh_ins:
+        return
+
+    rows = [
+        (user_id, week_start.isoformat(), round(weight, 1))
+        for user_id, week_start, weight, _ in weigh_ins
+    ]
+    weeks = sorted({week_start for _, week_start, _, _ in weigh_ins})
+
+    async with get_db(db) as conn:
+        await conn.executemany("""
+            INSERT INTO weigh_ins (user_id, week_start, weight)
+            VALUES (?, ?, ?)
+        """, rows)
+
+        # Look up the new IDs for the audit log
+        async with conn.execute("""
+            SELECT id, user_id, week_start FROM weigh_ins
+            WHERE week_start BETWEEN ? AND ?
+        """, (weeks[0].isoformat(), weeks[-1].isoformat())) as cursor:
+            ids = {(row["user_id"], row["week_start"]): row["id"] for row in await cursor.fetchall()}
+
+        await log_changes(conn, [
+            (
+                "weigh_in",
+                ids[(user_id, week_start)],
+                None,
+                {"user_id": user_id, "week_start": week_start, "weight": weight},
+                created_by,
+            )
+            for (user_id, week_start, weight), (_, _, _, created_by) in zip(rows, weigh_ins)
+        ])
 
-def get_weigh_in(user_id: int, week_start: date) -> Optional[dict]:
+        for week_start in weeks:
+            await calculate_weekly_result(conn, week_start)
+
+
+async def get_weigh_in(db: aiosqlite.Connection, user_id: int, week_start: date) -> Optional[dict]:
     """Get a specific weigh-in."""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT * FROM weigh_ins
-            WHERE user_id = ? AND week_start = ?
-        """, (user_id, week_start.isoformat()))
-        row = cursor.fetchone()
-        if row:
-            return dict(row)
-        return None
+    async with db.execute("""
+        SELECT * FROM weigh_ins
+        WHERE user_id = ? AND week_start = ?
+    """, (user_id, week_start.isoformat())) as cursor:
+        row = await cursor.fetchone()
+    if row:
+        return dict(row)
+    return None
 
 
-def get_user_weigh_ins(user_id: int) -> list[dict]:
-    """Get all weigh-ins for a user, ordered by date."""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
+async def get_user_weigh_ins(
+    db: aiosqlite.Connection,
+    user_id: int,
+    since: date = None
+) -> list[dict]:
+    """Get all weigh-ins for a user (optionally from `since` on), ordered by date."""
+    if since is None:
+        query, params = """
             SELECT * FROM weigh_ins
             WHERE user_id = ?
             ORDER BY week_start
-        """, (user_id,))
-        return [dict(row) for row in cursor.fetchall()]
+        """, (user_id,)
+    else:
+        query, params = """
+            SELECT * FROM weigh_ins
+            WHERE user_id = ? AND week_start >= ?
+            ORDER BY week_start
+        """, (user_id, since.isoformat())
 
+    async with db.execute(query, params) as cursor:
+        return [dict(row) for row in await cursor.fetchall()]
 
-def get_week_weigh_ins(week_start: date) -> list[dict]:
+
+async def get_user_weekly_changes(db: aiosqlite.Connection, user_id: int) -> list[aiosqlite.Row]:
+    """
+    Get a user's weigh-ins, ordered by date, each with its reference weight.
+    The reference is the same as get_previous_weight(): the previous week's
+    weight if that week has a weigh-in, otherwise the start weight.
+    """
+    async with db.execute("""
+        SELECT wi.week_start, wi.weight,
+               CASE WHEN LAG(wi.week_start) OVER w = date(wi.week_start, '-7 days')
+                    THEN LAG(wi.weight) OVER w
+                    ELSE u.start_weight
+               END AS ref
+        FROM weigh_ins wi
+        JOIN users u ON u.id = wi.user_id
+        WHERE wi.user_id = ?
+        WINDOW w AS (ORDER BY wi.week_start)
+        ORDER BY wi.week_start
+    """, (user_id,)) as cursor:
+        return await cursor.fetchall()
+
+
+async def get_weight_history(db: aiosqlite.Connection) -> list[aiosqlite.Row]:
+    """
+    Get every user's weigh-ins in one pass, ordered by user name, then date.
+    Users without weigh-ins appear once with NULL week_start and weight.
+    """
+    async with db.execute("""
+        SELECT u.id AS user_id, u.name, u.start_weight, wi.week_start, wi.weight
+        FROM users u
+        LEFT JOIN weigh_ins wi ON wi.user_id = u.id
+        ORDER BY u.name, wi.week_start
+    """) as cursor:
+        return await cursor.fetchall()
+
+
+async def get_week_weigh_ins(db: aiosqlite.Connection, week_start: date) -> list[dict]:
     """Get all weigh-ins for a specific week."""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT wi.*, u.name as user_name
-            FROM weigh_ins wi
-            JOIN users u ON wi.user_id = u.id
-            WHERE wi.week_start = ?
-        """, (week_start.isoformat(),))
-        return [dict(row) for row in cursor.fetchall()]
+    async with db.execute("""
+        SELECT wi.*, u.name as user_name
+        FROM weigh_ins wi
+        JOIN users u ON wi.user_id = u.id
+        WHERE wi.week_start = ?
+    """, (week_start.isoformat(),)) as cursor:
+        return [dict(row) for row in await cursor.fetchall()]
+
+
+async def get_week_weights(
+    db: aiosqlite.Connection,
+    week_start: date
+) -> list[tuple[int, float, str, float]]:
+    """
+    Get the (user_id, weight, user_name, reference_weight) of every weigh-in
+    for a week. The reference weight is what get_previous_weight() returns.
+    A lighter get_week_weigh_ins() for callers that don't return the rows.
+    """
+    prev_week = week_start - timedelta(days=7)
+    async with db.execute("""
+        SELECT wi.user_id, wi.weight, u.name,
+               COALESCE(prev.weight, u.start_weight) AS ref
+        FROM weigh_ins wi
+        JOIN users u ON wi.user_id = u.id
+        LEFT JOIN weigh_ins prev
+          ON prev.user_id = wi.user_id AND prev.week_start = ?
+        WHERE wi.week_start = ?
+    """, (prev_week.isoformat(), week_start.isoformat())) as cursor:
+        # Plain tuples, these rows are never turned into dicts
+        cursor.row_factory = None
+        return await cursor.fetchall()
+
+
+async def get_missing_names(db: aiosqlite.Connection, week_start: date) -> list[str]:
+    """Get the names of users without a weigh-in for a week, ordered by name."""
+    async with db.execute("""
+        SELECT name FROM users u
+        WHERE NOT EXISTS (
+            SELECT 1 FROM weigh_ins wi
+            WHERE wi.user_id = u.id AND wi.week_start = ?
+        )
+        ORDER BY name
+    """, (week_start.isoformat(),)) as cursor:
+        return [row["name"] for row in await cursor.fetchall()]
 
 
-def get_previous_weight(user_id: int, week_start: date) -> Optional[float]:
+async def get_week_participation(
+    db: aiosqlite.Connection,
+    week_start: date
+) -> tuple[list[dict], list[dict]]:
+    """
+    Split all users by whether they weighed in for a specific week.
+
+    Returns:
+        (weigh_ins, missing): the week's weigh-ins shaped like
+        get_week_weigh_ins(), and the users without one, ordered by name
+    """
+    async with db.execute("""
+        SELECT u.id AS user_id, u.name, u.start_weight, u.created_at AS user_created_at,
+               wi.id, wi.week_start, wi.weight, wi.created_at
+        FROM users u
+        LEFT JOIN weigh_ins wi ON wi.user_id = u.id AND wi.week_start = ?
+        ORDER BY u.name
+    """, (week_start.isoformat(),)) as cursor:
+        rows = await cursor.fetchall()
+
+    weigh_ins = []
+    missing = []
+    for row in rows:
+        if row["id"] is None:
+            missing.append({
+                "id": row["user_id"],
+                "name": row["name"],
+                "start_weight": row["start_weight"],
+                "created_at": row["user_created_at"],
+            })
+        else:
+            weigh_ins.append({
+                "id": row["id"],
+                "user_id": row["user_id"],
+                "week_start": row["week_start"],
+                "weight": row["weight"],
+                "created_at": row["created_at"],
+                "user_name": row["name"],
+            })
+    weigh_ins.sort(key=lambda wi: wi["id"])
+    return weigh_ins, missing
+
+
+async def get_previous_weight(
+    db: aiosqlite.Connection,
+    user_id: int,
+    week_start: date
+) -> Optional[float]:
     """
     Get the reference weight for calculating percentage change.
     Uses previous week's weight, or start_weight if no previous weigh-in.
     """
-    # Get previous week's weigh-in
+    # Previous week's weigh-in, falling back to start_weight, in one lookup
     prev_week = week_start - timedelta(days=7)
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT weight FROM weigh_ins
-            WHERE user_id = ? AND week_start = ?
-        """, (user_id, prev_week.isoformat()))
-        row = cursor.fetchone()
-        if row:
-            return row["weight"]
-
-        # No previous weigh-in, use start_weight
-        cursor.execute("SELECT start_weight FROM users WHERE id = ?", (user_id,))
-        user_row = cursor.fetchone()
-        if user_row:
-            return user_row["start_weight"]
+    async with db.execute("""
+        SELECT COALESCE(prev.weight, u.start_weight) AS ref
+        FROM users u
+        LEFT JOIN weigh_ins prev
+          ON prev.user_id = u.id AND prev.week_start = ?
+        WHERE u.id = ?
+    """, (prev_week.isoformat(), user_id)) as cursor:
+        row = await cursor.fetchone()
+    if row:
+        return row["ref"]
 
     return None
 
@@ -268,137 +456,181 @@ def calculate_percentage_change(previous_weight: float, current_weight: float) -
     return ((previous_weight - current_weight) / previous_weight) * 100
 
 
-def calculate_weekly_result(week_start: date) -> Optional[dict]:
+async def calculate_weekly_result(db: aiosqlite.Connection, week_start: date) -> Optional[dict]:
     """
     Calculate and store the weekly result (winner/loser).
     Must be called after all weigh-ins for the week are recorded.
+    The reads run in the same write transaction as the store, so the result
+    is never computed from another request's uncommitted weigh-ins.
     """
-    users = get_all_users()
-    weigh_ins = get_week_weigh_ins(week_start)
-
-    if len(weigh_ins) < len(users):
-        # Not all participants have weighed in yet
-        # Clear any existing result
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM weekly_results WHERE week_start = ?",
-                          (week_start.isoformat(),))
-        return None
-
-    # Calculate percentage change for each participant
-    changes = []
-    for wi in weigh_ins:
-        prev_weight = get_previous_weight(wi["user_id"], week_start)
-        if prev_weight is None:
-            continue
-
-        pct_change = calculate_percentage_change(prev_weight, wi["weight"])
-        changes.append({
-            "user_id": wi["user_id"],
-            "percent_change": pct_change
-        })
-
-    if not changes:
-        return None
-
-    # Sort by percentage change (highest = best)
-    changes.sort(key=lambda x: x["percent_change"], reverse=True)
-
-    winner_id = None
-    loser_id = None
-    pot_change = 0
-
-    # Check for tie at the top (no winner)
-    if len(changes) >= 2:
-        top_change = changes[0]["percent_change"]
-        second_change = changes[1]["percent_change"]
-
-        # Not a tie at top
-        if abs(top_change - second_change) >= 0.01:
+    async with get_db(db) as conn:
+        # This week's weights joined with their reference weight
+        # (previous week, or start_weight if there is none)
+        prev_week = week_start - timedelta(days=7)
+        async with conn.execute("""
+            SELECT wi.user_id, wi.weight AS cur,
+                   COALESCE(prev.weight, u.start_weight) AS ref,
+                   (SELECT COUNT(*) FROM users) AS n_users
+            FROM weigh_ins wi
+            JOIN users u ON u.id = wi.user_id
+            LEFT JOIN weigh_ins prev
+              ON prev.user_id = wi.user_id AND prev.week_start = ?
+            WHERE wi.week_start = ?
+        """, (prev_week.isoformat(), week_start.isoformat())) as cursor:
+            rows = await cursor.fetchall()
+
+        if not rows or len(rows) < rows[0]["n_users"]:
+            # Not all participants have weighed in yet
+            # Clear any existing result
+            await conn.execute("DELETE FROM weekly_results WHERE week_start = ?",
+                               (week_start.isoformat(),))
+            return None
+
+        # Calculate percentage change for each participant in one vectorized pass
+        prev = np.asarray([row["ref"] for row in rows], dtype=np.float64)
+        cur = np.asarray([row["cur"] for row in rows], dtype=np.float64)
+        pct = pct_changes(prev, cur)
+
+        # Sort by percentage change (highest = best), keeping row order on ties
+        order = np.argsort(-pct, kind="stable")
+        changes = [
+            {"user_id": rows[i]["user_id"], "percent_change": float(pct[i])}
+            for i in order
+        ]
+
+        winner_id = None
+        loser_id = None
+        pot_change = 0
+
+        # Check for tie at the top (no winner)
+        if len(changes) >= 2:
+            top_change = changes[0]["percent_change"]
+            second_change = changes[1]["percent_change"]
+
+            # Not a tie at top
+            if abs(top_change - second_change) >= 0.01:
+                winner_id = changes[0]["user_id"]
+
+            # Check for tie at bottom (no loser/pot payment)
+            bottom_change = changes[-1]["percent_change"]
+            second_bottom_change = changes[-2]["percent_change"]
+
+            if abs(bottom_change - second_bottom_change) >= 0.01:
+                loser_id = changes[-1]["user_id"]
+                pot_change = await get_pot_contribution(conn)
+
+        elif len(changes) == 1:
+            # Only one participant - they're the winner by default
             winner_id = changes[0]["user_id"]
 
-        # Check for tie at bottom (no loser/pot payment)
-        bottom_change = changes[-1]["percent_change"]
-        second_bottom_change = changes[-2]["percent_change"]
-
-        if abs(bottom_change - second_bottom_change) >= 0.01:
-            loser_id = changes[-1]["user_id"]
-            pot_change = get_pot_contribution()
-
-    elif len(changes) == 1:
-        # Only one participant - they're the winner by default
-        winner_id = changes[0]["user_id"]
-
-    # Store the result
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT OR REPLACE INTO weekly_results (week_start, winner_user_id, loser_user_id, pot_change)
+        # Store the result (an upsert, so the POT triggers see an UPDATE;
+        # REPLACE would delete the old row without firing the delete trigger)
+        await conn.execute("""
+            INSERT INTO weekly_results (week_start, winner_user_id, loser_user_id, pot_change)
             VALUES (?, ?, ?, ?)
+            ON CONFLICT (week_start) DO UPDATE SET
+                winner_user_id = excluded.winner_user_id,
+                loser_user_id = excluded.loser_user_id,
+                pot_change = excluded.pot_change
         """, (week_start.isoformat(), winner_id, loser_id, pot_change))
 
-    return get_weekly_result(week_start)
+        return await get_weekly_result(conn, week_start)
 
 
-def get_weekly_result(week_start: date) -> Optional[dict]:
+async def get_weekly_result(db: aiosqlite.Connection, week_start: date) -> Optional[dict]:
     """Get the result for a specific week."""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT wr.*,
-                   w.name as winner_name,
-                   l.name as loser_name
-            FROM weekly_results wr
-            LEFT JOIN users w ON wr.winner_user_id = w.id
-            LEFT JOIN users l ON wr.loser_user_id = l.id
-            WHERE wr.week_start = ?
-        """, (week_start.isoformat(),))
-        row = cursor.fetchone()
-        if row:
-            return dict(row)
-        return None
+    async with db.execute("""
+        SELECT wr.*,
+               w.name as winner_name,
+               l.name as loser_name
+        FROM weekly_results wr
+        LEFT JOIN users w ON wr.winner_user_id = w.id
+        LEFT JOIN users l ON wr.loser_user_id = l.id
+        WHERE wr.week_start = ?
+    """, (week_start.isoformat(),)) as cursor:
+        row = await cursor.fetchone()
+    if row:
+        return dict(row)
+    return None
 
 
-def get_all_weekly_results() -> list[dict]:
-    """Get all weekly results."""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT wr.*,
-                   w.name as winner_name,
-                   l.name as loser_name
-            FROM weekly_results wr
-            LEFT JOIN users w ON wr.winner_user_id = w.id
-            LEFT JOIN users l ON wr.loser_user_id = l.id
-            ORDER BY wr.week_start DESC
-        """)
-        return [dict(row) for row in cursor.fetchall()]
+async def get_all_weekly_results(db: aiosqlite.Connection) -> list[aiosqlite.Row]:
+    """
+    Get all weekly results.
+    Rows are returned as-is for the stats helpers; convert before serializing.
+    """
+    async with db.execute("""
+        SELECT wr.*,
+               w.name as winner_name,
+               l.name as loser_name
+        FROM weekly_results wr
+        LEFT JOIN users w ON wr.winner_user_id = w.id
+        LEFT JOIN users l ON wr.loser_user_id = l.id
+        ORDER BY wr.week_start DESC
+    """) as cursor:
+        return await cursor.fetchall()
+
+
+async def get_standings(db: aiosqlite.Connection) -> list[aiosqlite.Row]:
+    """
+    Get every user with their latest weight and number of weekly wins.
+    Users without weigh-ins report their start weight. Ordered by name.
+    """
+    async with db.execute("""
+        WITH latest AS (
+            SELECT user_id, weight,
+                   ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY week_start DESC) AS rn
+            FROM weigh_ins
+        ),
+        wins AS (
+            SELECT winner_user_id, COUNT(*) AS wins
+            FROM weekly_results
+            WHERE winner_user_id IS NOT NULL
+            GROUP BY winner_user_id
+        )
+        SELECT u.id, u.name, u.start_weight,
+               COALESCE(l.weight, u.start_weight) AS current_weight,
+               COALESCE(w.wins, 0) AS wins
+        FROM users u
+        LEFT JOIN latest l ON l.user_id = u.id AND l.rn = 1
+        LEFT JOIN wins w ON w.winner_user_id = u.id
+        ORDER BY u.name
+    """) as cursor:
+        return await cursor.fetchall()
+
+
+async def get_user_win_loss_counts(db: aiosqlite.Connection, user_id: int) -> tuple[int, int]:
+    """Get how many weeks a user has won and lost, as (wins, losses)."""
+    # Two index-only counts on idx_wr_winner / idx_wr_loser
+    async with db.execute("""
+        SELECT (SELECT COUNT(*) FROM weekly_results WHERE winner_user_id = ?) AS wins,
+               (SELECT COUNT(*) FROM weekly_results WHERE loser_user_id = ?) AS losses
+    """, (user_id, user_id)) as cursor:
+        row = await cursor.fetchone()
+    return row["wins"], row["losses"]
 
 
 # ============================================================================
 # POT Operations
 # ============================================================================
 
-def get_pot_total() -> int:
+async def get_pot_total(db: aiosqlite.Connection) -> int:
     """Get the current total in the POT."""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT COALESCE(SUM(pot_change), 0) as total FROM weekly_results")
-        row = cursor.fetchone()
-        return row["total"] if row else 0
+    # Maintained by triggers on weekly_results, see init_db()
+    async with db.execute("SELECT total FROM pot WHERE id = 1") as cursor:
+        row = await cursor.fetchone()
+    return row["total"] if row else 0
 
 
-def get_pot_contributions() -> list[dict]:
+async def get_pot_contributions(db: aiosqlite.Connection) -> list[dict]:
     """Get breakdown of who contributed to the POT."""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT u.id, u.name,
-                   COUNT(wr.loser_user_id) as times_lost,
-                   COALESCE(SUM(wr.pot_change), 0) as total_contributed
-            FROM users u
-            LEFT JOIN weekly_results wr ON u.id = wr.loser_user_id
-            GROUP BY u.id
-            ORDER BY total_contributed DESC
-        """)
-        return [dict(row) for row in cursor.fetchall()]
+    async with db.execute("""
+        SELECT u.id, u.name,
+               COUNT(wr.loser_user_id) as times_lost,
+               COALESCE(SUM(wr.pot_change), 0) as total_contributed
+        FROM users u
+        LEFT JOIN weekly_results wr ON u.id = wr.loser_user_id
+        GROUP BY u.id
+        ORDER BY total_contributed DESC
+    """) as cursor:
+        return [dict(row) for row in await cursor.fetchall()]
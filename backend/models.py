@@ -3,13 +3,16 @@ Database models and schema for Weight Battle application.
 Uses SQLite with raw SQL for simplicity.
 """
 
-import sqlite3
+import asyncio
 import os
+from contextvars import ContextVar
 from datetime import datetime
 from pathlib import Path
-from contextlib import contextmanager
+from contextlib import asynccontextmanager
 from typing import Optional
 
+import aiosqlite
+
 # Allow database path to be configured via environment variable for Docker
 DATABASE_PATH = Path(os.environ.get("DATABASE_PATH", Path(__file__).parent / "db.sqlite"))
 
@@ -17,38 +20,117 @@ DATABASE_PATH = Path(os.environ.get("DATABASE_PATH", Path(__file__).parent / "db
 DEFAULT_POT_CONTRIBUTION = 5  # Euros per losing week
 DEFAULT_BATTLE_END_DATE = "2026-04-05"  # Easter Sunday
 
-
-def get_connection() -> sqlite3.Connection:
-    """Get a database connection with row factory enabled."""
-    conn = sqlite3.connect(DATABASE_PATH, timeout=30.0)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
-    conn.execute("PRAGMA journal_mode = WAL")  # Better concurrency
-    conn.execute("PRAGMA busy_timeout = 30000")  # Wait up to 30s if locked
+# Stored in PRAGMA user_version; bump whenever init_db() changes the schema
+SCHEMA_VERSION = 3
+
+# Per-connection cache of compiled statements, keyed by SQL text. All queries
+# are fixed strings, so this just has to hold every distinct one (~50 today)
+CACHED_STATEMENTS = 256
+
+
+# Serializes write transactions on the shared connection
+_write_lock = asyncio.Lock()
+
+# Set while the current task holds the write transaction
+_in_transaction: ContextVar[bool] = ContextVar("_in_transaction", default=False)
+
+# In-process copy of the config table. Config changes a handful of times per
+# battle, so after the first load reads never touch SQLite.
+_CONFIG_CACHE: dict[str, str] = {}
+_CFG_LOADED = False
+# Parsed integer values, dropped together with the string they came from
+_CONFIG_INTS: dict[str, int] = {}
+# Set when the current write transaction changed the config table
+_config_written = False
+
+# Bumped whenever a write transaction ends, so derived data can be memoized
+_data_version = 0
+
+
+async def get_connection(read_only: bool = False) -> aiosqlite.Connection:
+    """
+    Open a database connection with row factory enabled.
+    The app opens one write connection at startup and shares it across requests,
+    plus a few read-only ones that serve GET routes next to it (WAL allows that).
+    """
+    if read_only:
+        conn = await aiosqlite.connect(
+            f"{DATABASE_PATH.resolve().as_uri()}?mode=ro", uri=True, timeout=30.0,
+            cached_statements=CACHED_STATEMENTS
+        )
+    else:
+        conn = await aiosqlite.connect(
+            DATABASE_PATH, timeout=30.0, cached_statements=CACHED_STATEMENTS
+        )
+        await conn.execute("PRAGMA journal_mode = WAL")  # Better concurrency
+        await conn.execute("PRAGMA cache_spill = OFF")  # Keep dirty pages in RAM until commit
+    conn.row_factory = aiosqlite.Row
+    await conn.execute("PRAGMA foreign_keys = ON")
+    await conn.execute("PRAGMA busy_timeout = 30000")  # Wait up to 30s if locked
+    await conn.execute("PRAGMA synchronous = NORMAL")  # Safe with WAL, fewer fsyncs
+    await conn.execute("PRAGMA temp_store = MEMORY")  # Sorts/temp tables in RAM
+    await conn.execute("PRAGMA mmap_size = 268435456")  # Memory-map up to 256 MB
+    await conn.execute("PRAGMA cache_size = -20000")  # ~20 MB page cache
     return conn
 
 
-@contextmanager
-def get_db():
-    """Context manager for database connections."""
-    conn = get_connection()
-    try:
-        yield conn
-        conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
-    finally:
-        conn.close()
+async def close_connection(conn: aiosqlite.Connection) -> None:
+    """Close a connection, updating query planner statistics first."""
+    await conn.execute("PRAGMA optimize")
+    await conn.close()
 
 
-def init_db():
-    """Initialize the database with all required tables."""
-    with get_db() as conn:
-        cursor = conn.cursor()
-
+@asynccontextmanager
+async def get_db(conn: aiosqlite.Connection):
+    """
+    Context manager for a write transaction on the shared connection.
+    Writers are serialized so one request never commits another's half-done work.
+    Nested use joins the outer transaction, so a whole write path commits once.
+    """
+    if _in_transaction.get():
+        yield conn
+        return
+
+    global _config_written, _data_version
+    async with _write_lock:
+        token = _in_transaction.set(True)
+        _config_written = False
+        try:
+            await conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            await conn.commit()
+            # The config cache still holds the values from before this transaction
+            if _config_written:
+                _invalidate_config()
+        except BaseException:
+            await conn.rollback()
+            # Cached config may hold values that were just rolled back
+            _invalidate_config()
+            raise
+        finally:
+            _in_transaction.reset(token)
+            _config_written = False
+            # Also after a rollback: reads on this connection saw the uncommitted rows
+            _data_version += 1
+
+
+def get_data_version() -> int:
+    """Counter that changes after every write transaction."""
+    return _data_version
+
+
+async def init_db(db: aiosqlite.Connection):
+    """
+    Initialize the database with all required tables.
+    Does nothing if the schema is already at SCHEMA_VERSION.
+    """
+    async with db.execute("PRAGMA user_version") as cursor:
+        if (await cursor.fetchone())[0] >= SCHEMA_VERSION:
+            return
+
+    async with get_db(db) as conn:
         # Config table for app settings
-        cursor.execute("""
+        await conn.execute("""
             CREATE TABLE IF NOT EXISTS config (
                 key TEXT PRIMARY KEY,
                 value TEXT NOT NULL
@@ -56,7 +138,7 @@ def init_db():
         """)
 
         # Users table
-        cursor.execute("""
+        await conn.execute("""
             CREATE TABLE IF NOT EXISTS users (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT NOT NULL UNIQUE,
@@ -66,7 +148,7 @@ def init_db():
         """)
 
         # Weigh-ins table
-        cursor.execute("""
+        await conn.execute("""
             CREATE TABLE IF NOT EXISTS weigh_ins (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id INTEGER NOT NULL,
@@ -79,7 +161,7 @@ def init_db():
         """)
 
         # Weekly results table
-        cursor.execute("""
+        await conn.execute("""
             CREATE TABLE IF NOT EXISTS weekly_results (
                 week_start DATE PRIMARY KEY,
                 winner_user_id INTEGER,
@@ -90,8 +172,43 @@ def init_db():
             )
         """)
 
+        # Running POT total, kept in step with weekly_results by triggers
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS pot (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                total INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        await conn.execute("""
+            INSERT OR IGNORE INTO pot (id, total)
+            SELECT 1, COALESCE(SUM(pot_change), 0) FROM weekly_results
+        """)
+        await conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS weekly_results_pot_insert
+            AFTER INSERT ON weekly_results
+            BEGIN
+                UPDATE pot SET total = total + COALESCE(NEW.pot_change, 0) WHERE id = 1;
+            END
+        """)
+        await conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS weekly_results_pot_update
+            AFTER UPDATE OF pot_change ON weekly_results
+            BEGIN
+                UPDATE pot
+                SET total = total + COALESCE(NEW.pot_change, 0) - COALESCE(OLD.pot_change, 0)
+                WHERE id = 1;
+            END
+        """)
+        await conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS weekly_results_pot_delete
+            AFTER DELETE ON weekly_results
+            BEGIN
+                UPDATE pot SET total = total - COALESCE(OLD.pot_change, 0) WHERE id = 1;
+            END
+        """)
+
         # Audit log table
-        cursor.execute("""
+        await conn.execute("""
             CREATE TABLE IF NOT EXISTS audit_log (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 entity TEXT NOT NULL,
@@ -104,82 +221,140 @@ def init_db():
         """)
 
         # Create indexes for performance
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_weigh_ins_user_id
-            ON weigh_ins(user_id)
+        # Per-user history covers (user_id, week_start, weight) without
+        # touching the table; it also replaces the old user_id-only index
+        await conn.execute("DROP INDEX IF EXISTS idx_weigh_ins_user_id")
+        await conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_weigh_ins_uid_week
+            ON weigh_ins(user_id, week_start, weight)
         """)
-        cursor.execute("""
+        await conn.execute("""
             CREATE INDEX IF NOT EXISTS idx_weigh_ins_week_start
             ON weigh_ins(week_start)
         """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_audit_log_entity
+        # The global feed pages by id (the rowid), so it needs no extra index
+        await conn.execute("DROP INDEX IF EXISTS idx_audit_log_entity")
+        await conn.execute("DROP INDEX IF EXISTS idx_audit_time")
+        # Per-entity feeds order and page by id too: the implicit rowid suffix
+        # serves ORDER BY id DESC and id < ? straight from the index. Schema
+        # version 2 had changed_at in it, which made SQLite sort every page.
+        await conn.execute("DROP INDEX IF EXISTS idx_audit_entity")
+        await conn.execute("""
+            CREATE INDEX idx_audit_entity
             ON audit_log(entity, entity_id)
         """)
+        # Win/loss counts per user
+        await conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_wr_winner
+            ON weekly_results(winner_user_id)
+        """)
+        await conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_wr_loser
+            ON weekly_results(loser_user_id)
+        """)
+
+        await conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
 
 
 # ============================================================================
 # Config Functions
 # ============================================================================
 
-def get_config(key: str, default: str = None) -> Optional[str]:
+def _invalidate_config() -> None:
+    """Force the next config read to reload from the database."""
+    global _CFG_LOADED
+    _CFG_LOADED = False
+    _CONFIG_INTS.clear()
+
+
+async def reload_config(db: aiosqlite.Connection) -> dict:
+    """
+    Load the config table into the in-process cache.
+    Call after changing the config table without set_config().
+    """
+    global _CFG_LOADED
+    version = _data_version
+    async with db.execute("SELECT key, value FROM config") as cursor:
+        rows = await cursor.fetchall()
+    _CONFIG_CACHE.clear()
+    _CONFIG_INTS.clear()
+    _CONFIG_CACHE.update(rows)  # (key, value) rows are already pairs
+    # If a write finished meanwhile the rows may predate it; read again next time
+    _CFG_LOADED = version == _data_version
+    return dict(_CONFIG_CACHE)
+
+
+def _own_config_writes() -> bool:
+    """
+    True inside a write transaction that has changed the config table.
+    The shared cache only ever holds committed values, so such a transaction
+    reads its own changes from the database instead.
+    """
+    return _config_written and _in_transaction.get()
+
+
+async def get_config(db: aiosqlite.Connection, key: str, default: str = None) -> Optional[str]:
     """Get a config value by key."""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT value FROM config WHERE key = ?", (key,))
-        row = cursor.fetchone()
-        if row:
-            return row["value"]
-        return default
+    if _own_config_writes():
+        async with db.execute("SELECT value FROM config WHERE key = ?", (key,)) as cursor:
+            row = await cursor.fetchone()
+        return row[0] if row else default
+    if not _CFG_LOADED:
+        await reload_config(db)
+    return _CONFIG_CACHE.get(key, default)
 
 
-def set_config(key: str, value: str) -> None:
+async def set_config(db: aiosqlite.Connection, key: str, value: str) -> None:
     """Set a config value."""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
+    global _config_written
+    async with get_db(db) as conn:
+        await conn.execute("""
             INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)
         """, (key, value))
+        # The cache is dropped once this transaction commits (see get_db)
+        _config_written = True
 
 
-def get_all_config() -> dict:
+async def get_all_config(db: aiosqlite.Connection) -> dict:
     """Get all config values."""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT key, value FROM config")
-        return {row["key"]: row["value"] for row in cursor.fetchall()}
+    if _own_config_writes():
+        async with db.execute("SELECT key, value FROM config") as cursor:
+            return dict(await cursor.fetchall())
+    if not _CFG_LOADED:
+        await reload_config(db)
+    return dict(_CONFIG_CACHE)
 
 
-def is_setup_complete() -> bool:
+async def is_setup_complete(db: aiosqlite.Connection) -> bool:
     """Check if the initial setup has been completed."""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        # Setup is complete if we have at least one user and battle_end_date is set
-        cursor.execute("SELECT COUNT(*) as count FROM users")
-        user_count = cursor.fetchone()["count"]
+    # The flag is only written after at least one participant was created
+    return await get_config(db, "setup_complete") is not None
+
 
-        cursor.execute("SELECT value FROM config WHERE key = 'setup_complete'")
-        setup_flag = cursor.fetchone()
+async def config_int(db: aiosqlite.Connection, key: str, default: int) -> int:
+    """Get a config value as an integer, parsed once until it changes."""
+    own_writes = _own_config_writes()
+    if key in _CONFIG_INTS and not own_writes:
+        return _CONFIG_INTS[key]
 
-        return user_count > 0 and setup_flag is not None
+    version = _data_version
+    value = await get_config(db, key)
+    parsed = int(value) if value else default
+    if version == _data_version and not own_writes:
+        _CONFIG_INTS[key] = parsed
+    return parsed
 
 
-def get_pot_contribution() -> int:
+async def get_pot_contribution(db: aiosqlite.Connection) -> int:
     """Get the pot contribution amount per loss."""
-    value = get_config("pot_contribution")
-    return int(value) if value else DEFAULT_POT_CONTRIBUTION
+    return await config_int(db, "pot_contribution", DEFAULT_POT_CONTRIBUTION)
 
 
-def get_battle_end_date() -> str:
+async def get_battle_end_date(db: aiosqlite.Connection) -> str:
     """Get the battle end date."""
-    return get_config("battle_end_date", DEFAULT_BATTLE_END_DATE)
+    return await get_config(db, "battle_end_date", DEFAULT_BATTLE_END_DATE)
 
 
-def get_total_amount() -> int:
+async def get_total_amount(db: aiosqlite.Connection) -> int:
     """Get the total amount for the final payment (e.g., dinner)."""
-    value = get_config("total_amount")
-    return int(value) if value else 100  # Default 100 EUR
-
-
-# Initialize database on module import
-init_db()
+    return await config_int(db, "total_amount", 100)  # Default 100 EUR
@@ -3,6 +3,7 @@ Seed script to populate the database with realistic test data.
 Run this once to create sample data for testing.
 """
 
+import asyncio
 import sys
 from datetime import date, timedelta
 from pathlib import Path
@@ -10,31 +11,33 @@ from pathlib import Path
 # Add backend to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from models import init_db, get_db, set_config
-from crud import create_user, create_weigh_in, get_week_start
+from models import init_db, get_connection, close_connection, get_db, set_config, reload_config
+from crud import create_user, create_weigh_ins, get_week_start
 
 # Clear existing data and reinitialize
-def clear_database():
+async def clear_database(db):
     """Clear all data from the database."""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM weekly_results")
-        cursor.execute("DELETE FROM weigh_ins")
-        cursor.execute("DELETE FROM audit_log")
-        cursor.execute("DELETE FROM users")
-        cursor.execute("DELETE FROM config")
+    async with get_db(db) as conn:
+        await conn.execute("DELETE FROM weekly_results")
+        await conn.execute("DELETE FROM weigh_ins")
+        await conn.execute("DELETE FROM audit_log")
+        await conn.execute("DELETE FROM users")
+        await conn.execute("DELETE FROM config")
+    await reload_config(db)
+    # Give the freed pages back (can't run inside a transaction)
+    await db.execute("VACUUM")
     print("Database cleared.")
 
 
-def setup_config():
+async def setup_config(db):
     """Set up default configuration."""
-    set_config("pot_contribution", "5")
-    set_config("total_amount", "100")
-    set_config("battle_end_date", "2026-04-05")
-    set_config("setup_complete", "true")
+    await set_config(db, "pot_contribution", "5")
+    await set_config(db, "total_amount", "100")
+    await set_config(db, "battle_end_date", "2026-04-05")
+    await set_config(db, "setup_complete", "true")
     print("Config set up.")
 
-def seed_data():
+async def seed_data(db):
     """Seed the database with realistic test data."""
 
     # Create participants with realistic starting weights
@@ -47,7 +50,7 @@ def seed_data():
 
     users = {}
     for name, start_weight in participants:
-        user = create_user(name, start_weight, created_by="seed_script")
+        user = await create_user(db, name, start_weight, created_by="seed_script")
         users[name] = user
         print(f"Created user: {name} ({start_weight} kg)")
 
@@ -69,6 +72,7 @@ def seed_data():
 
     print(f"\nGenerating weigh-ins from {start_date} to {today}...")
 
+    weigh_ins = []
     for week_num in range(8):
         week_start = start_date + timedelta(weeks=week_num)
         print(f"\nWeek {week_num + 1} ({week_start}):")
@@ -80,13 +84,7 @@ def seed_data():
             total_change = sum(patterns[name][:week_num + 1])
             weight = round(start_weight + total_change, 1)
 
-            # Create weigh-in
-            create_weigh_in(
-                user_id=user["id"],
-                weight=weight,
-                week_start=week_start,
-                created_by=name
-            )
+            weigh_ins.append((user["id"], week_start, weight, name))
 
             # Calculate percentage change for display
             if week_num == 0:
@@ -98,6 +96,9 @@ def seed_data():
             pct_change = ((prev_weight - weight) / prev_weight) * 100
             print(f"  {name}: {weight} kg ({pct_change:+.2f}%)")
 
+    # One bulk insert; each week is evaluated once afterwards
+    await create_weigh_ins(db, weigh_ins)
+
     print("\n" + "="*50)
     print("Seed data created successfully!")
     print("="*50)
@@ -111,10 +112,21 @@ def seed_data():
         print(f"  {name}: {start_weight} kg -> {final_weight:.1f} kg ({total_pct:+.2f}% total)")
 
 
+async def main():
+    db = await get_connection()
+    try:
+        await init_db(db)
+        await clear_database(db)
+        # Commit all seed data at once
+        async with get_db(db):
+            await setup_config(db)
+            await seed_data(db)
+    finally:
+        await close_connection(db)
+
+
 if __name__ == "__main__":
     print("Weight Battle - Seed Data Script")
     print("="*50)
 
-    clear_database()
-    setup_config()
-    seed_data()
+    asyncio.run(main())
@@ -4,52 +4,93 @@ Includes leaderboard, progress tracking, and linear regression forecasts.
 """
 
 from datetime import date, datetime, timedelta
+from functools import wraps
+from itertools import groupby
+from operator import itemgetter
 from typing import Optional
-from models import get_db, get_battle_end_date, get_pot_contribution, get_total_amount
+import time
+
+import aiosqlite
+import numpy as np
+
+from models import get_battle_end_date, get_data_version, get_pot_contribution, get_total_amount
 from crud import (
     get_all_users,
-    get_user_weigh_ins,
+    get_user_weekly_changes,
     get_all_weekly_results,
     get_pot_total,
     get_pot_contributions,
-    get_previous_weight,
     calculate_percentage_change,
-    get_week_weigh_ins,
+    get_week_weights,
     get_current_week_start,
+    get_missing_names,
+    get_standings,
+    get_user_win_loss_counts,
+    get_weight_history,
 )
 
 
 # Threshold for "head-to-head" race detection
 HEAD_TO_HEAD_THRESHOLD = 0.3  # percent
 
+# Memoized results are dropped after this many seconds even without a write
+# through this process: commits from other processes (seed_data.py) don't bump
+# the data version, so this bounds how long they stay invisible
+MEMO_TTL = 30
+
+# Memoized results for _cache_version, keyed by (function, day, args)
+_CACHE: dict[tuple, object] = {}
+_cache_version = None
+_cache_started = 0.0
+
 
-def get_leaderboard() -> list[dict]:
+def memoized(func):
+    """
+    Reuse a stats function's result until the next write transaction,
+    or for at most MEMO_TTL seconds.
+    Keyed on today's date too, since most results depend on the current week.
+    Callers must not mutate the returned value.
+    """
+    @wraps(func)
+    async def wrapper(db: aiosqlite.Connection, *args):
+        global _cache_version, _cache_started
+        version = get_data_version()
+        now = time.monotonic()
+        key = (func.__name__, date.today(), args)
+        fresh = version == _cache_version and now - _cache_started < MEMO_TTL
+        if fresh and key in _CACHE:
+            return _CACHE[key]
+
+        result = await func(db, *args)
+
+        # Only store if no write finished while we were computing
+        if version == get_data_version():
+            if version != _cache_version or now - _cache_started >= MEMO_TTL:
+                _CACHE.clear()
+                _cache_version = version
+                _cache_started = now
+            _CACHE[key] = result
+        return result
+    return wrapper
+
+
+@memoized
+async def get_leaderboard(db: aiosqlite.Connection) -> list[dict]:
     """
     Get the current leaderboard based on total weekly wins.
     Returns users sorted by wins (descending).
     """
-    users = get_all_users()
-    results = get_all_weekly_results()
-
-    # Count wins per user
-    win_counts = {u["id"]: 0 for u in users}
-    for result in results:
-        if result["winner_user_id"]:
-            win_counts[result["winner_user_id"]] = win_counts.get(result["winner_user_id"], 0) + 1
-
     # Build leaderboard
     leaderboard = []
-    for user in users:
-        weigh_ins = get_user_weigh_ins(user["id"])
-        current_weight = weigh_ins[-1]["weight"] if weigh_ins else user["start_weight"]
-        total_change = calculate_percentage_change(user["start_weight"], current_weight)
+    for row in await get_standings(db):
+        total_change = calculate_percentage_change(row["start_weight"], row["current_weight"])
 
         leaderboard.append({
-            "user_id": user["id"],
-            "name": user["name"],
-            "wins": win_counts[user["id"]],
-            "start_weight": user["start_weight"],
-            "current_weight": current_weight,
+            "user_id": row["id"],
+            "name": row["name"],
+            "wins": row["wins"],
+            "start_weight": row["start_weight"],
+            "current_weight": row["current_weight"],
             "total_percent_change": round(total_change, 2),
         })
 
@@ -63,21 +104,17 @@ def get_leaderboard() -> list[dict]:
     return leaderboard
 
 
-def get_user_stats(user_id: int) -> Optional[dict]:
+async def get_user_stats(db: aiosqlite.Connection, user_id: int) -> Optional[dict]:
     """
     Get detailed statistics for a specific user.
     """
     from crud import get_user
-    user = get_user(user_id)
+    user = await get_user(db, user_id)
     if not user:
         return None
 
-    weigh_ins = get_user_weigh_ins(user_id)
-    results = get_all_weekly_results()
-
-    # Count wins and losses
-    wins = sum(1 for r in results if r["winner_user_id"] == user_id)
-    losses = sum(1 for r in results if r["loser_user_id"] == user_id)
+    weigh_ins = await get_user_weekly_changes(db, user_id)
+    wins, losses = await get_user_win_loss_counts(db, user_id)
 
     # Calculate current stats
     current_weight = weigh_ins[-1]["weight"] if weigh_ins else user["start_weight"]
@@ -86,8 +123,7 @@ def get_user_stats(user_id: int) -> Optional[dict]:
     # Build weekly history
     weekly_data = []
     for wi in weigh_ins:
-        week_start = date.fromisoformat(wi["week_start"]) if isinstance(wi["week_start"], str) else wi["week_start"]
-        prev_weight = get_previous_weight(user_id, week_start)
+        prev_weight = wi["ref"]
         pct_change = calculate_percentage_change(prev_weight, wi["weight"]) if prev_weight else 0
 
         weekly_data.append({
@@ -110,31 +146,29 @@ def get_user_stats(user_id: int) -> Optional[dict]:
     }
 
 
-def get_overview() -> dict:
+@memoized
+async def get_overview(db: aiosqlite.Connection) -> dict:
     """
     Get an overview of the current battle state.
     """
-    users = get_all_users()
-    leaderboard = get_leaderboard()
-    pot_total = get_pot_total()
+    # The leaderboard has one entry per user, so it doubles as the user list
+    leaderboard = await get_leaderboard(db)
+    pot_total = await get_pot_total(db)
     current_week = get_current_week_start()
 
     # Get current week weigh-ins
-    current_weigh_ins = get_week_weigh_ins(current_week)
-    weighed_in_ids = {wi["user_id"] for wi in current_weigh_ins}
-    missing_weigh_ins = [u["name"] for u in users if u["id"] not in weighed_in_ids]
+    current_weigh_ins = await get_week_weights(db, current_week)
+    missing_weigh_ins = await get_missing_names(db, current_week)
 
     # Calculate current week standings
     week_standings = []
-    for wi in current_weigh_ins:
-        week_start = current_week
-        prev_weight = get_previous_weight(wi["user_id"], week_start)
+    for user_id, weight, name, prev_weight in current_weigh_ins:
         if prev_weight:
-            pct_change = calculate_percentage_change(prev_weight, wi["weight"])
+            pct_change = calculate_percentage_change(prev_weight, weight)
             week_standings.append({
-                "user_id": wi["user_id"],
-                "name": wi["user_name"],
-                "weight": wi["weight"],
+                "user_id": user_id,
+                "name": name,
+                "weight": weight,
                 "percent_change": round(pct_change, 2),
             })
 
@@ -150,7 +184,7 @@ def get_overview() -> dict:
     leader = leaderboard[0] if leaderboard else None
 
     # Calculate days until battle end
-    battle_end_date = get_battle_end_date()
+    battle_end_date = await get_battle_end_date(db)
     end_date = date.fromisoformat(battle_end_date)
     days_remaining = (end_date - date.today()).days
 
@@ -158,7 +192,7 @@ def get_overview() -> dict:
         "current_week": current_week.isoformat(),
         "battle_end_date": battle_end_date,
         "days_remaining": max(0, days_remaining),
-        "total_participants": len(users),
+        "total_participants": len(leaderboard),
         "pot_total": pot_total,
         "leader": leader,
         "current_week_standings": week_standings,
@@ -168,14 +202,15 @@ def get_overview() -> dict:
     }
 
 
-def get_pot_info() -> dict:
+@memoized
+async def get_pot_info(db: aiosqlite.Connection) -> dict:
     """
     Get detailed POT information.
     """
-    total = get_pot_total()
-    contributions = get_pot_contributions()
-    results = get_all_weekly_results()
-    total_amount = get_total_amount()
+    total = await get_pot_total(db)
+    contributions = await get_pot_contributions(db)
+    results = await get_all_weekly_results(db)
+    total_amount = await get_total_amount(db)
 
     # Get recent contributions (last 5)
     recent = []
@@ -207,63 +242,96 @@ def get_pot_info() -> dict:
     }
 
 
-def linear_regression(x_values: list, y_values: list) -> tuple[float, float]:
+def linear_regressions(
+    group: np.ndarray,
+    x: np.ndarray,
+    y: np.ndarray,
+    n_groups: int
+) -> tuple[np.ndarray, np.ndarray]:
     """
-    Simple linear regression to find slope and intercept.
-    Returns (slope, intercept)
+    Simple linear regression for many series at once.
+    group holds each point's series index (0 to n_groups - 1).
+    Returns (slopes, intercepts); series without spread in x get slope 0.
     """
-    n = len(x_values)
-    if n < 2:
-        return 0.0, y_values[0] if y_values else 0.0
+    counts = np.maximum(np.bincount(group, minlength=n_groups), 1)
+    x_mean = np.bincount(group, weights=x, minlength=n_groups) / counts
+    y_mean = np.bincount(group, weights=y, minlength=n_groups) / counts
 
-    sum_x = sum(x_values)
-    sum_y = sum(y_values)
-    sum_xy = sum(x * y for x, y in zip(x_values, y_values))
-    sum_x2 = sum(x * x for x in x_values)
+    # Mean-centered form, numerically stabler than the raw sums
+    dx = x - x_mean[group]
+    sxx = np.bincount(group, weights=dx * dx, minlength=n_groups)
+    sxy = np.bincount(group, weights=dx * (y - y_mean[group]), minlength=n_groups)
+    slopes = np.divide(sxy, sxx, out=np.zeros(n_groups), where=sxx != 0)
 
-    denominator = n * sum_x2 - sum_x * sum_x
-    if denominator == 0:
-        return 0.0, sum_y / n
+    return slopes, y_mean - slopes * x_mean
 
-    slope = (n * sum_xy - sum_x * sum_y) / denominator
-    intercept = (sum_y - slope * sum_x) / n
 
-    return slope, intercept
+async def load_history_frame(db: aiosqlite.Connection) -> dict:
+    """
+    Load all weigh-ins as NumPy columns, grouped by user in name order.
+
+    Returns:
+        user_id, week_idx (position in the user's own history), weight and
+        group (index of the user's run of rows) arrays, plus by_user mapping
+        each user ID to its slice of the arrays
+    """
+    rows = [row for row in await get_weight_history(db) if row["weight"] is not None]
+    n = len(rows)
+    user_id = np.fromiter((row["user_id"] for row in rows), dtype=np.int64, count=n)
+    weight = np.fromiter((row["weight"] for row in rows), dtype=np.float64, count=n)
+
+    # Each user's rows are contiguous; find where the runs start
+    starts = np.flatnonzero(np.diff(user_id)) + 1
+    starts = np.concatenate(([0], starts)) if n else starts
+    ends = np.append(starts[1:], n)
+    week_idx = np.arange(n) - np.repeat(starts, ends - starts)
+    group = np.repeat(np.arange(len(starts)), ends - starts)
+
+    return {
+        "user_id": user_id,
+        "week_idx": week_idx,
+        "weight": weight,
+        "group": group,
+        "by_user": {int(user_id[start]): slice(start, end) for start, end in zip(starts, ends)},
+    }
 
 
-def get_prognosis() -> dict:
+@memoized
+async def get_prognosis(db: aiosqlite.Connection) -> dict:
     """
     Get weight projections for all users until the battle end date.
     Uses simple linear regression on weekly weights.
     """
-    users = get_all_users()
-    battle_end_date = get_battle_end_date()
+    users = await get_all_users(db)
+    battle_end_date = await get_battle_end_date(db)
     end_date = date.fromisoformat(battle_end_date)
     today = date.today()
     weeks_remaining = max(0, (end_date - today).days // 7)
 
     projections = []
+    frame = await load_history_frame(db)
+    slopes, intercepts = linear_regressions(
+        frame["group"], frame["week_idx"], frame["weight"], len(frame["by_user"])
+    )
 
     for user in users:
-        weigh_ins = get_user_weigh_ins(user["id"])
+        span = frame["by_user"].get(user["id"], slice(0, 0))
+        weights = frame["weight"][span]
 
-        if len(weigh_ins) < 2:
+        if len(weights) < 2:
             # Not enough data for projection
             projections.append({
                 "user_id": user["id"],
                 "name": user["name"],
-                "current_weight": weigh_ins[-1]["weight"] if weigh_ins else user["start_weight"],
+                "current_weight": float(weights[-1]) if len(weights) else user["start_weight"],
                 "projected_weight": None,
                 "projected_total_change": None,
                 "trend": "insufficient_data",
             })
             continue
 
-        # Convert weigh-ins to numerical format for regression
-        weights = [wi["weight"] for wi in weigh_ins]
-        weeks = list(range(len(weights)))
-
-        slope, intercept = linear_regression(weeks, weights)
+        slope = float(slopes[frame["group"][span.start]])
+        intercept = float(intercepts[frame["group"][span.start]])
 
         # Project to end date
         projected_week = len(weights) + weeks_remaining
@@ -272,7 +340,7 @@ def get_prognosis() -> dict:
         # Don't allow negative weights
         projected_weight = max(projected_weight, 40.0)
 
-        current_weight = weights[-1]
+        current_weight = float(weights[-1])
         projected_change = calculate_percentage_change(user["start_weight"], projected_weight)
 
         # Determine trend
@@ -306,28 +374,31 @@ def get_prognosis() -> dict:
     }
 
 
-def get_weekly_comparison(week_start: date = None) -> dict:
+async def get_weekly_comparison(db: aiosqlite.Connection, week_start: date = None) -> dict:
     """
     Get side-by-side comparison of all users for a specific week.
     """
     if week_start is None:
         week_start = get_current_week_start()
 
-    weigh_ins = get_week_weigh_ins(week_start)
-    users = get_all_users()
+    weigh_ins = await get_week_weights(db, week_start)
+    users = await get_all_users(db)
+
+    # (weight, reference_weight) by user
+    by_uid = {user_id: (weight, ref) for user_id, weight, _, ref in weigh_ins}
 
     comparison = []
     for user in users:
-        wi = next((w for w in weigh_ins if w["user_id"] == user["id"]), None)
+        wi = by_uid.get(user["id"])
 
         if wi:
-            prev_weight = get_previous_weight(user["id"], week_start)
-            pct_change = calculate_percentage_change(prev_weight, wi["weight"]) if prev_weight else 0
+            weight, prev_weight = wi
+            pct_change = calculate_percentage_change(prev_weight, weight) if prev_weight else 0
 
             comparison.append({
                 "user_id": user["id"],
                 "name": user["name"],
-                "weight": wi["weight"],
+                "weight": weight,
                 "percent_change": round(pct_change, 2),
                 "weighed_in": True,
             })
@@ -351,21 +422,23 @@ def get_weekly_comparison(week_start: date = None) -> dict:
     }
 
 
-def get_relative_progress() -> dict:
+async def get_relative_progress(db: aiosqlite.Connection) -> dict:
     """
     Get progress data relative to start weight (start = 100%).
     Used for charting.
     """
-    users = get_all_users()
     progress_data = []
 
-    for user in users:
-        weigh_ins = get_user_weigh_ins(user["id"])
-        start = user["start_weight"]
+    history = await get_weight_history(db)
+    for user_id, rows in groupby(history, key=itemgetter("user_id")):
+        rows = list(rows)
+        start = rows[0]["start_weight"]
 
         data_points = [{"week": "Start", "value": 100.0}]
 
-        for wi in weigh_ins:
+        for wi in rows:
+            if wi["weight"] is None:
+                continue  # No weigh-ins yet
             relative = (wi["weight"] / start) * 100
             data_points.append({
                 "week": wi["week_start"],
@@ -373,8 +446,8 @@ def get_relative_progress() -> dict:
             })
 
         progress_data.append({
-            "user_id": user["id"],
-            "name": user["name"],
+            "user_id": user_id,
+            "name": rows[0]["name"],
             "data": data_points,
         })
 
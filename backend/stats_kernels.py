@@ -0,0 +1,29 @@
+"""
+Compiled numeric kernels for Weight Battle statistics.
+Hot array math lives here so it runs as Numba machine code instead of
+interpreted Python loops.
+"""
+
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def pct_changes(prev: np.ndarray, cur: np.ndarray) -> np.ndarray:
+    """
+    Percentage weight change for each (previous, current) pair.
+    Positive = weight loss (good), Negative = weight gain (bad).
+    A previous weight of 0 yields 0.0, like calculate_percentage_change().
+    """
+    out = np.empty(prev.shape[0], dtype=np.float64)
+    for i in range(prev.shape[0]):
+        if prev[i] == 0:
+            out[i] = 0.0
+        else:
+            out[i] = ((prev[i] - cur[i]) / prev[i]) * 100
+    return out
+
+
+def warmup() -> None:
+    """Compile (or load cached) kernels so the first request doesn't pay for it."""
+    pct_changes(np.zeros(1), np.zeros(1))
@@ -0,0 +1,70 @@
+"""
+Regression tests for the in-process config cache.
+Run from backend/: python -m unittest
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import models
+
+
+class ConfigCacheTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._db_path = models.DATABASE_PATH
+        models.DATABASE_PATH = Path(self._tmp.name) / "db.sqlite"
+        models._invalidate_config()
+        self.db = await models.get_connection()
+        await models.init_db(self.db)
+        await models.set_config(self.db, "pot_contribution", "5")
+        self.read_db = await models.get_connection(read_only=True)
+
+    async def asyncTearDown(self):
+        await self.read_db.close()
+        await self.db.close()
+        models.DATABASE_PATH = self._db_path
+        models._invalidate_config()
+        self._tmp.cleanup()
+
+    async def test_reload_during_set_config_is_not_kept(self):
+        # Unloaded cache, e.g. after a rolled-back write
+        models._invalidate_config()
+
+        async with models.get_db(self.db):
+            await models.set_config(self.db, "pot_contribution", "9")
+            # A GET on a read connection reloads before the commit
+            self.assertEqual(await models.get_pot_contribution(self.read_db), 5)
+
+        self.assertEqual(await models.get_pot_contribution(self.read_db), 9)
+        self.assertEqual(await models.get_config(self.read_db, "pot_contribution"), "9")
+
+    async def test_loaded_cache_only_holds_committed_values(self):
+        self.assertEqual(await models.get_pot_contribution(self.read_db), 5)
+
+        async with models.get_db(self.db):
+            await models.set_config(self.db, "pot_contribution", "9")
+            # Other connections keep seeing the committed value
+            self.assertEqual(await models.get_pot_contribution(self.read_db), 5)
+            self.assertEqual(await models.get_config(self.read_db, "pot_contribution"), "5")
+            # The writing transaction sees its own change
+            self.assertEqual(await models.get_pot_contribution(self.db), 9)
+            self.assertEqual((await models.get_all_config(self.db))["pot_contribution"], "9")
+
+        self.assertEqual(await models.get_pot_contribution(self.read_db), 9)
+
+    async def test_rollback_drops_cached_value(self):
+        await models.get_all_config(self.db)
+
+        with self.assertRaises(RuntimeError):
+            async with models.get_db(self.db):
+                await models.set_config(self.db, "pot_contribution", "9")
+                self.assertEqual(await models.get_pot_contribution(self.read_db), 5)
+                raise RuntimeError
+
+        self.assertEqual(await models.get_pot_contribution(self.read_db), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
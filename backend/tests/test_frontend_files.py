@@ -0,0 +1,66 @@
+"""
+Tests for serving the frontend's precompressed files.
+Run from backend/: python -m unittest
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import FrontendFiles, accepted_encodings
+
+
+class AcceptedEncodingsTest(unittest.TestCase):
+    def test_parses_names_and_q_values(self):
+        self.assertEqual(accepted_encodings("gzip, deflate, br"), {"gzip", "deflate", "br"})
+        self.assertEqual(accepted_encodings("br;q=0, gzip;q=0.5"), {"gzip"})
+        self.assertEqual(accepted_encodings("GZIP ; Q=0.000"), set())
+        self.assertEqual(accepted_encodings(""), set())
+
+
+class FrontendFilesTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        root = Path(self._tmp.name)
+        (root / "app.js").write_text("console.log('plain');")
+        (root / "app.js.br").write_bytes(b"brotli")
+        (root / "app.js.gz").write_bytes(b"gzip")
+
+        app = FastAPI()
+        app.mount("/", FrontendFiles(directory=root, html=True), name="frontend")
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.client.close()
+        self._tmp.cleanup()
+
+    def headers_for(self, accept_encoding: str):
+        # Headers only: the fixtures aren't really compressed
+        with self.client.stream(
+            "GET", "/app.js", headers={"Accept-Encoding": accept_encoding}
+        ) as response:
+            self.assertEqual(response.status_code, 200)
+            return response.headers
+
+    def test_prefers_brotli(self):
+        headers = self.headers_for("gzip, br")
+        self.assertEqual(headers["content-encoding"], "br")
+        self.assertEqual(headers["vary"], "Accept-Encoding")
+
+    def test_falls_back_to_gzip(self):
+        self.assertEqual(self.headers_for("gzip")["content-encoding"], "gzip")
+
+    def test_skips_refused_encoding(self):
+        self.assertEqual(self.headers_for("br;q=0, gzip")["content-encoding"], "gzip")
+
+    def test_serves_plain_file_when_nothing_matches(self):
+        self.assertNotIn("content-encoding", self.headers_for("br;q=0, gzip;q=0"))
+        response = self.client.get("/app.js", headers={"Accept-Encoding": "identity"})
+        self.assertEqual(response.text, "console.log('plain');")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -33,6 +33,8 @@ let state = {
 async function api(endpoint, options = {}) {
     const url = `${API_BASE}${endpoint}`;
     const response = await fetch(url, {
+        // Revalidate with the server (ETag) instead of trusting max-age
+        cache: 'no-cache',
         ...options,
         headers: {
             'Content-Type': 'application/json',
@@ -759,7 +761,7 @@ async function loadStatsScreen() {
         renderProgressChart(progress);
         renderPrognosis(prognosis);
         renderPotDetails(potInfo);
-        renderAuditLog(auditLog);
+        renderAuditLog(auditLog.items);
     } catch (error) {
         showToast('Fehler beim Laden: ' + error.message, 'error');
     }